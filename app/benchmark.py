@@ -0,0 +1,362 @@
+"""
+Benchmark the recommendation pipeline on a seeded synthetic catalog.
+
+    python -m app.benchmark --preset small
+    python -m app.benchmark --preset large --save-baseline bench/large.json
+    python -m app.benchmark --preset large --baseline bench/large.json
+
+The synthetic taxonomy (branches, domains, skills, roles, role -> skill links
+with a Zipf-like skill popularity) is generated from --seed and loaded into a
+local SQLite file, which is reused on later runs with the same parameters.
+
+Every stage of /recommend is timed on its own: normalize_user_skills,
+fuzzy_match_domain, get_roles_for_skills, role scoring and the skill gap
+computation. End-to-end POST /recommend is also timed, with a stubbed
+summarizer. The report lists p50/p95/p99 latency, SQL queries per call and
+peak traced memory per stage. With --baseline, each percentile is compared to
+a saved report and the exit status is 1 if any stage slowed down by more than
+--max-regression.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+PRESETS = {
+    "small": {"branches": 4, "domains": 40, "skills": 10000, "roles": 10000},
+    "medium": {"branches": 8, "domains": 120, "skills": 30000, "roles": 30000},
+    "large": {"branches": 12, "domains": 300, "skills": 100000, "roles": 100000},
+}
+
+# A few real names first: they become the most popular skills and exercise the
+# punctuation/word-boundary handling of the skill matcher.
+_REAL_SKILLS = ["Python", "SQL", "Java", "JavaScript", "C++", "C#", ".NET", "Node.js", "React", "Excel",
+                "Machine Learning", "Statistics", "Docker", "Kubernetes", "AWS", "Linux", "Git", "R", "C"]
+_WORDS = ["data", "cloud", "network", "security", "mobile", "web", "embedded", "signal", "quantum", "robotics",
+          "design", "analytics", "finance", "audit", "marketing", "supply", "clinical", "energy", "legal", "media",
+          "graph", "stream", "compiler", "database", "vision", "speech", "game", "payments", "risk", "geo"]
+_KINDS = ["modeling", "engineering", "testing", "architecture", "operations", "analysis", "automation",
+          "optimization", "management", "programming", "visualization", "research"]
+_FIELDS = ["Science", "Engineering", "Analytics", "Design", "Operations", "Research", "Management", "Security"]
+
+
+# --------------------------
+# Synthetic catalog
+# --------------------------
+def synthetic_catalog(seed: int, branches: int, domains: int, skills: int, roles: int,
+                      mean_skills_per_role: float = 8.0) -> Dict[str, list]:
+    """Rows for every taxonomy table. Skill popularity is Zipf-like (weight 1/rank^1.1)."""
+    rng = np.random.default_rng(seed)
+    words = random.Random(seed)
+
+    branch_rows = [{"branch_id": i + 1, "branch_name": f"Branch {i + 1}"} for i in range(branches)]
+    domain_rows = [
+        {"domain_id": i + 1,
+         "domain": f"{words.choice(_WORDS).title()} {_FIELDS[i % len(_FIELDS)]} {i + 1}",
+         "domain_description": f"Synthetic domain {i + 1}",
+         "branch_id": i % branches + 1}
+        for i in range(domains)
+    ]
+
+    names = list(_REAL_SKILLS[:skills])
+    seen = {n.lower() for n in names}
+    while len(names) < skills:
+        name = f"{words.choice(_WORDS).title()} {words.choice(_KINDS).title()}"
+        if name.lower() in seen:
+            name = f"{name} {len(names)}"
+        seen.add(name.lower())
+        names.append(name)
+    skill_rows = [{"skill_id": i + 1, "skill_name": n} for i, n in enumerate(names)]
+
+    role_rows = [
+        {"role_id": i + 1,
+         "job_title_short": f"{words.choice(_WORDS).title()} {words.choice(_KINDS).title()} Specialist {i + 1}",
+         "domain_id": int(rng.integers(domains)) + 1,
+         "job_description": f"Synthetic role {i + 1}"}
+        for i in range(roles)
+    ]
+
+    weights = 1.0 / np.arange(1, skills + 1) ** 1.1
+    cdf = np.cumsum(weights) / weights.sum()
+    sizes = np.clip(np.rint(rng.lognormal(np.log(mean_skills_per_role), 0.5, roles)), 1, 40).astype(int)
+    link_rows = []
+    for role_id, k in enumerate(sizes.tolist(), start=1):
+        picked = np.unique(np.searchsorted(cdf, rng.random(k + 4)))[:k]
+        link_rows.extend({"role_id": role_id, "skill_id": int(s) + 1} for s in picked)
+
+    return {"branches": branch_rows, "domains": domain_rows, "skills": skill_rows,
+            "job_roles": role_rows, "job_role_skills": link_rows}
+
+
+def synthetic_requests(catalog: Dict[str, list], seed: int, count: int) -> List[Dict[str, Any]]:
+    """/recommend payloads: popular and rare skills, misspelled domains, free text, ~10% with no skills."""
+    rnd = random.Random(seed + 1)
+    skill_names = [s["skill_name"] for s in catalog["skills"]]
+    head = skill_names[:200]
+    domain_names = [d["domain"] for d in catalog["domains"]]
+    requests = []
+    for _ in range(count):
+        no_skills = rnd.random() < 0.1
+        skills = [] if no_skills else rnd.sample(head, rnd.randint(1, 4)) + rnd.sample(skill_names, rnd.randint(0, 3))
+        if skills and rnd.random() < 0.3:
+            skills.append("not a real skill")
+        domain = None
+        if rnd.random() < 0.6:
+            domain = rnd.choice(domain_names).rsplit(" ", 1)[0]
+            if rnd.random() < 0.5:
+                domain = domain.lower()[:-1]  # truncated, lowercase
+        free_text = None
+        if not no_skills and rnd.random() < 0.5:
+            mentioned = ", ".join(rnd.sample(head, 2))
+            free_text = f"I have worked with {mentioned} and I enjoy solving problems with data."
+        requests.append({"skills": skills, "interest_domain": domain, "free_text": free_text,
+                         "top_k": rnd.choice([3, 5, 5, 10])})
+    return requests
+
+
+def load_catalog(db_path: str, catalog: Dict[str, list]):
+    from sqlalchemy import insert
+
+    from . import models
+    from .database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    tables = [models.Branch, models.Domain, models.Skill, models.JobRole, models.JobRoleSkill]
+    with engine.begin() as conn:
+        for model in tables:
+            rows = catalog[model.__tablename__]
+            for i in range(0, len(rows), 50000):
+                conn.execute(insert(model), rows[i:i + 50000])
+
+
+# --------------------------
+# Measurement
+# --------------------------
+class QueryCounter:
+    """Counts every statement executed on the engine."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ms = np.array(samples) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            "mean_ms": round(float(ms.mean()), 3)}
+
+
+def measure(fn: Callable[[Any], Any], inputs: List[Any], queries: QueryCounter,
+            memory_sample: int = 50) -> Dict[str, Any]:
+    """Latency over every input (after a short warm-up), then traced peak memory over a separate pass."""
+    for item in inputs[:20]:
+        fn(item)
+    latencies, query_counts = [], []
+    for item in inputs:
+        before = queries.count
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+        query_counts.append(queries.count - before)
+
+    tracemalloc.start()
+    for item in inputs[:memory_sample]:
+        fn(item)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result = _percentiles(latencies)
+    result.update(calls=len(inputs),
+                  queries_per_call=round(float(np.mean(query_counts)), 2),
+                  max_queries=int(max(query_counts)),
+                  peak_traced_kb=round(peak / 1024, 1))
+    return result
+
+
+def run(args) -> Dict[str, Any]:
+    params = dict(PRESETS[args.preset])
+    for key in ("branches", "domains", "skills", "roles"):
+        if getattr(args, key) is not None:
+            params[key] = getattr(args, key)
+
+    signature = "_".join(f"{k}{v}" for k, v in sorted(params.items())) + f"_seed{args.seed}"
+    db_path = args.db or os.path.join(tempfile.gettempdir(), f"aspire_bench_{signature}.db")
+    fresh = not os.path.exists(db_path)
+
+    # Configure the app for the benchmark database before it is imported.
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["CATALOG_VERSION_CHECK_SECONDS"] = "3600"  # nothing writes mid-run; read versions once
+    os.environ["SUMMARY_CACHE_PATH"] = ""
+
+    started = time.perf_counter()
+    catalog = synthetic_catalog(args.seed, **params)
+    if fresh:
+        load_catalog(db_path, catalog)
+    setup_seconds = time.perf_counter() - started
+
+    from fastapi.testclient import TestClient
+
+    from .catalog import get_domain_index, get_role_skill_matrix, get_skill_index
+    from .database import SessionLocal, engine
+    from .routers import recommendations
+    from .schemas import RecommendationRequest
+
+    async def stub_summary(payload):
+        return "Benchmark summary."
+
+    recommendations.make_user_friendly_summary_async = stub_summary
+    from .main import app
+
+    queries = QueryCounter(engine)
+    payloads = [RecommendationRequest(**r) for r in synthetic_requests(catalog, args.seed, args.requests)]
+    db = SessionLocal()
+    try:
+        tracemalloc.start()
+        start = time.perf_counter()
+        get_skill_index(db)
+        get_domain_index(db)
+        matrix = get_role_skill_matrix(db)
+        cold = {"seconds": round(time.perf_counter() - start, 3),
+                "peak_traced_kb": round(tracemalloc.get_traced_memory()[1] / 1024, 1)}
+        tracemalloc.stop()
+
+        domain_index = get_domain_index(db)
+        normalized = [recommendations.normalize_user_skills(db, p.skills, p.free_text) for p in payloads]
+        matched = [recommendations.fuzzy_match_domain(p.interest_domain, domain_index) for p in payloads]
+        scoring_inputs = [(n[1], d, p.top_k) for n, d, p in zip(normalized, matched, payloads)]
+        scored = [matrix.top_roles(*item) for item in scoring_inputs]
+
+        def gaps(item):
+            rows, similarities, user_vector = item
+            role_ids = matrix.role_ids[rows].tolist()
+            return [recommendations._role_dict(matrix, row, role_id, {}, sim, user_vector)
+                    for row, role_id, sim in zip(rows.tolist(), role_ids, similarities.tolist())]
+
+        stages = {
+            "normalize_user_skills": measure(
+                lambda p: recommendations.normalize_user_skills(db, p.skills, p.free_text), payloads, queries),
+            "fuzzy_match_domain": measure(
+                lambda p: recommendations.fuzzy_match_domain(p.interest_domain, get_domain_index(db)), payloads, queries),
+            "score_roles": measure(lambda item: matrix.top_roles(*item), scoring_inputs, queries),
+            "skill_gaps": measure(gaps, scored, queries),
+            "get_roles_for_skills": measure(
+                lambda item: recommendations.get_roles_for_skills(db, *item), scoring_inputs, queries),
+        }
+    finally:
+        db.close()
+
+    client = TestClient(app)
+    bodies = [p.model_dump() for p in payloads]
+
+    def end_to_end(body):
+        response = client.post("/recommend", json=body)
+        if response.status_code != 200:
+            raise RuntimeError(f"/recommend returned {response.status_code}: {response.text[:200]}")
+
+    stages["recommend_e2e"] = measure(end_to_end, bodies, queries)
+
+    return {
+        "params": dict(params, seed=args.seed, requests=args.requests),
+        "catalog": {"links": len(catalog["job_role_skills"]), "db_path": db_path, "generated": fresh,
+                    "setup_seconds": round(setup_seconds, 2)},
+        "cold_index_build": cold,
+        "stages": stages,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+# --------------------------
+# Reporting
+# --------------------------
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float,
+            min_delta_ms: float = 0.05) -> List[str]:
+    """
+    Stage percentiles that got slower than the baseline by more than `max_regression`
+    and by at least `min_delta_ms` (so microsecond stages don't flag on timer noise).
+    """
+    regressions = []
+    for stage, current in report["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            slower = current[key] - previous[key]
+            if slower > min_delta_ms and slower > previous[key] * max_regression:
+                regressions.append(f"{stage} {key}: {previous[key]} -> {current[key]}")
+    return regressions
+
+
+def print_report(report: Dict[str, Any], baseline: Dict[str, Any] = None):
+    print(f"params: {report['params']}  links: {report['catalog']['links']}")
+    print(f"cold index build: {report['cold_index_build']}  peak RSS: {report['peak_rss_mb']} MB")
+    header = f"{'stage':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak KB':>10}"
+    if baseline:
+        header += f"{'p95 vs base':>13}"
+    print(header)
+    for stage, m in report["stages"].items():
+        line = (f"{stage:<24}{m['p50_ms']:>10.3f}{m['p95_ms']:>10.3f}{m['p99_ms']:>10.3f}"
+                f"{m['queries_per_call']:>9.2f}{m['peak_traced_kb']:>10.1f}")
+        previous = (baseline or {}).get("stages", {}).get(stage)
+        if previous and previous["p95_ms"] > 0:
+            line += f"{m['p95_ms'] / previous['p95_ms']:>12.2f}x"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation pipeline on a synthetic catalog.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--branches", type=int)
+    parser.add_argument("--domains", type=int)
+    parser.add_argument("--skills", type=int)
+    parser.add_argument("--roles", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=500, help="synthetic /recommend payloads per stage")
+    parser.add_argument("--db", help="SQLite file (default: a temp file keyed by the catalog parameters)")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--save-baseline", help="write the JSON report here as the new baseline")
+    parser.add_argument("--baseline", help="compare against this saved report")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed slowdown per percentile before failing (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05,
+                        help="ignore slowdowns smaller than this many milliseconds")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if baseline:
+        if baseline.get("params") != report["params"]:
+            print("=== WARNING: baseline was recorded with different parameters ===", baseline.get("params"))
+        regressions = compare(report, baseline, args.max_regression, args.min_delta_ms)
+        for regression in regressions:
+            print("=== REGRESSION:", regression, "===")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import models
+from .skill_matcher import SkillMatcher
+
+
+# --------------------------
+# Table versions
+# --------------------------
+# Change counters kept in the catalog_versions table, bumped by the crud layer
+# in the same transaction as the write, so every worker sees a committed change.
+# Cached indexes remember the versions they were built from and are rebuilt
+# lazily on the next read after any of those tables change. Each worker reads
+# the counters (one small query) at most every CATALOG_VERSION_CHECK_SECONDS;
+# 0 reads them on every lookup. Writes that bypass the app and the importer
+# (manual SQL) should bump catalog_versions too, or they show up only after a
+# restart.
+CATALOG_VERSION_CHECK_SECONDS = float(os.getenv("CATALOG_VERSION_CHECK_SECONDS", "1"))
+
+_versions: Dict[str, int] = {}
+_versions_read_at = float("-inf")
+
+
+def mark_changed(db: Session, *tables: str):
+    """
+    Bump the shared version of each given table inside `db`'s transaction; the
+    caller's commit publishes the change to every worker.
+    """
+    global _versions_read_at
+    version = models.CatalogVersion
+    for table in tables:
+        bump = update(version).where(version.table_name == table).values(version=version.version + 1)
+        if db.execute(bump).rowcount:
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(version).values(table_name=table, version=1))
+        except IntegrityError:
+            # Another writer created the row first
+            db.execute(bump)
+    # Re-read on the next lookup so this worker sees its own write straight away
+    _versions_read_at = float("-inf")
+
+
+def _shared_versions(db: Session) -> Dict[str, int]:
+    global _versions, _versions_read_at
+    now = time.monotonic()
+    if now - _versions_read_at < CATALOG_VERSION_CHECK_SECONDS:
+        return _versions
+    try:
+        rows = db.execute(select(models.CatalogVersion.table_name, models.CatalogVersion.version)).all()
+        _versions = {table: version for table, version in rows}
+    except SQLAlchemyError as e:
+        # Keep the last known versions (e.g. schema not migrated yet); retry after the check interval
+        print("=== ERROR: reading catalog versions failed ===", str(e))
+        db.rollback()
+    _versions_read_at = now
+    return _versions
+
+
+def table_version(db: Session, table: str) -> str:
+    return str(_shared_versions(db).get(table, 0))
+
+
+_cache: Dict[str, Tuple[Tuple[str, ...], Any]] = {}
+_build_locks: Dict[str, threading.Lock] = {}
+# Builds in progress on this thread (the matrix and snapshot builds look up the skill/domain indexes)
+_building = threading.local()
+
+
+def _cached(db: Session, name: str, tables: Tuple[str, ...], build: Callable[[], Any]):
+    """
+    Return the cached value for `name`, rebuilding it if any of `tables` changed.
+    Only one request rebuilds a given index; while it does, other requests keep
+    getting the previous version instead of queueing behind the rebuild. A
+    lookup made from inside another build waits instead: an index built from a
+    stale dependency would be cached under the new versions and stay stale.
+    """
+    key = tuple(table_version(db, t) for t in tables)
+    entry = _cache.get(name)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    depth = getattr(_building, "depth", 0)
+    lock = _build_locks.setdefault(name, threading.Lock())
+    if not lock.acquire(blocking=entry is None or depth > 0):
+        return entry[1]
+    try:
+        entry = _cache.get(name)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        _building.depth = depth + 1
+        try:
+            value = build()
+        finally:
+            _building.depth = depth
+        _cache[name] = (key, value)
+        return value
+    finally:
+        lock.release()
+
+
+# --------------------------
+# Skill index
+# --------------------------
+class SkillIndex:
+    """Lookup maps and the free-text matcher for the skills table."""
+
+    def __init__(self, skills):
+        self.id_to_name = {sk.skill_id: sk.skill_name for sk in skills}
+        self.name_to_id = {sk.skill_name.lower(): sk.skill_id for sk in skills}
+        self.all_skills = [sk.skill_name for sk in skills]
+        self.matcher = SkillMatcher(self.all_skills)
+
+
+def get_skill_index(db: Session) -> SkillIndex:
+    return _cached(
+        db,
+        "skills",
+        (models.Skill.__tablename__,),
+        lambda: SkillIndex(db.query(models.Skill).all()),
+    )
+
+
+# --------------------------
+# Domain index
+# --------------------------
+class DomainIndex:
+    """Lowercased domain choices prepared once, with an LRU of fuzzy-match results."""
+
+    def __init__(self, domains: List[str], cache_size: int = 4096):
+        self.domains = domains
+        self.choices = [d.lower() for d in domains]
+        self._match = lru_cache(maxsize=cache_size)(self._extract)
+
+    def _extract(self, query: str, threshold: int) -> Optional[str]:
+        result = process.extractOne(query, self.choices, scorer=fuzz.partial_ratio, score_cutoff=threshold)
+        return self.domains[result[2]] if result else None
+
+    def match(self, user_domain: str, threshold: int = 75) -> Optional[str]:
+        query = user_domain.lower().strip()
+        if not query:
+            return None
+        return self._match(query, threshold)
+
+
+def get_domain_index(db: Session) -> DomainIndex:
+    return _cached(
+        db,
+        "domains",
+        (models.Domain.__tablename__,),
+        lambda: DomainIndex([d for (d,) in db.query(models.Domain.domain).all()]),
+    )
+
+
+# --------------------------
+# Catalog snapshot
+# --------------------------
+class CatalogSnapshot:
+    """
+    The skills and domains lists served by /catalog, with a content-derived
+    version (identical across workers for identical data) and a pre-serialized body.
+    """
+
+    def __init__(self, skill_index: SkillIndex, domain_index: DomainIndex):
+        self.skills_lookup = [{"skill_name": sk} for sk in skill_index.all_skills]
+        self.domains_lookup = [{"domain": d} for d in domain_index.domains]
+        content = json.dumps(
+            [skill_index.all_skills, domain_index.domains], separators=(",", ":"), ensure_ascii=False
+        )
+        self.version = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+        self.etag = f'"{self.version}"'
+        self.body = json.dumps(
+            {
+                "catalog_version": self.version,
+                "skills_lookup": self.skills_lookup,
+                "domains_lookup": self.domains_lookup,
+            },
+            separators=(",", ":"),
+            ensure_ascii=False,
+        ).encode("utf-8")
+
+
+def get_catalog_snapshot(db: Session) -> CatalogSnapshot:
+    return _cached(
+        db,
+        "catalog_snapshot",
+        (models.Skill.__tablename__, models.Domain.__tablename__),
+        lambda: CatalogSnapshot(get_skill_index(db), get_domain_index(db)),
+    )
+
+
+# --------------------------
+# Role x skill matrix
+# --------------------------
+class RoleSkillMatrix:
+    """
+    Sparse (CSR) role x skill incidence matrix built from job_role_skills.
+
+    Rows are job roles that resolve to a domain and branch, columns follow the
+    skill index order. Scoring a user is one sparse mat-vec against their skill
+    vector, then a partial sort (np.partition) for the top-k rows. Roles are also
+    ranked by skill count, for users without any recognized skills.
+    """
+
+    def __init__(self, skill_index: SkillIndex, roles, domains, links):
+        # Domains (small) keep their display fields; roles keep only what scoring needs.
+        self.domain_names: List[str] = []
+        self.domain_info: List[Tuple[str, Optional[str], str]] = []
+        domain_code: Dict[int, int] = {}
+        for domain_id, domain, domain_desc, branch_name in domains:
+            domain_code[domain_id] = len(self.domain_names)
+            self.domain_names.append(domain)
+            self.domain_info.append((domain, domain_desc, branch_name))
+
+        self.role_ids = np.array([r[0] for r in roles], dtype=np.int64)
+        self.role_titles: List[str] = [r[1] for r in roles]
+        self.role_domain = np.array([domain_code[r[2]] for r in roles], dtype=np.int32)
+
+        self.skill_col: Dict[int, int] = {sid: i for i, sid in enumerate(skill_index.id_to_name)}
+        self.col_names: List[str] = list(skill_index.id_to_name.values())
+
+        n_roles = len(self.role_ids)
+        rows = self._lookup(self.role_ids, np.arange(n_roles), [r for r, _ in links])
+        skill_ids = np.array(list(self.skill_col), dtype=np.int64)
+        cols = self._lookup(skill_ids, np.arange(len(skill_ids)), [s for _, s in links])
+        keep = (rows >= 0) & (cols >= 0)
+        rows, cols = rows[keep], cols[keep]
+        order = np.lexsort((cols, rows))
+        self.indices = cols[order].astype(np.int32)
+        self.row_of_nnz = rows[order].astype(np.int32)
+        self.row_len = np.bincount(self.row_of_nnz, minlength=n_roles).astype(np.int32)
+        self.indptr = np.zeros(n_roles + 1, dtype=np.int64)
+        np.cumsum(self.row_len, out=self.indptr[1:])
+
+        # Column-major copy (skill -> roles postings) so scoring a sparse user
+        # vector only touches the roles that share one of its skills.
+        by_col = np.argsort(self.indices, kind="stable")
+        self.col_rows = self.row_of_nnz[by_col]
+        self.col_ptr = np.zeros(len(self.col_names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=len(self.col_names)), out=self.col_ptr[1:])
+
+        # Popularity ranking: most required skills first, then role_id.
+        self.popular_rows = np.lexsort((self.role_ids, -self.row_len))
+
+        self._domain_masks: Dict[str, np.ndarray] = {}
+        self._domain_popular: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.role_ids)
+
+    @staticmethod
+    def _lookup(keys: np.ndarray, values: np.ndarray, wanted: List[int]) -> np.ndarray:
+        """Vectorized dict lookup: map each of `wanted` to its value, or -1 if absent."""
+        wanted = np.array(wanted, dtype=np.int64)
+        if len(keys) == 0:
+            return np.full(len(wanted), -1, dtype=np.int64)
+        order = np.argsort(keys)
+        pos = np.clip(np.searchsorted(keys, wanted, sorter=order), 0, len(keys) - 1)
+        found = keys[order[pos]] == wanted
+        return np.where(found, values[order[pos]], -1)
+
+    def domain_mask(self, domain_filter: str) -> np.ndarray:
+        """Row mask of roles whose domain contains `domain_filter` (case-insensitive)."""
+        key = domain_filter.lower()
+        mask = self._domain_masks.get(key)
+        if mask is None:
+            codes = [i for i, name in enumerate(self.domain_names) if key in name.lower()]
+            mask = np.isin(self.role_domain, codes)
+            self._domain_masks[key] = mask
+        return mask
+
+    def popular_roles(self, domain_filter: Optional[str], top_k: int) -> np.ndarray:
+        """Rows of the `top_k` roles with the most skills, optionally within a domain filter."""
+        if top_k <= 0:
+            return self.popular_rows[:0]
+        if not domain_filter:
+            return self.popular_rows[:top_k]
+        key = domain_filter.lower()
+        ranked = self._domain_popular.get(key)
+        if ranked is None:
+            ranked = self.popular_rows[self.domain_mask(key)[self.popular_rows]]
+            self._domain_popular[key] = ranked
+        return ranked[:top_k]
+
+    def user_vector(self, skill_ids: List[int]) -> np.ndarray:
+        u = np.zeros(len(self.col_names), dtype=bool)
+        cols = [self.skill_col[sid] for sid in skill_ids if sid in self.skill_col]
+        u[cols] = True
+        return u
+
+    def top_roles(self, skill_ids: List[int], domain_filter: Optional[str], top_k: int):
+        """
+        Return (rows, similarity, user_vector) for the `top_k` best-matching roles that
+        share at least one skill with the user, ordered by similarity then role_id.
+        """
+        u = self.user_vector(skill_ids)
+        cols = np.flatnonzero(u)
+        # Sparse mat-vec R @ u, accumulated over the user's (few) non-zero columns.
+        postings = [self.col_rows[self.col_ptr[c]:self.col_ptr[c + 1]] for c in cols.tolist()]
+        hits = np.concatenate(postings) if postings else np.empty(0, dtype=np.int32)
+        matched = np.bincount(hits, minlength=len(self.role_ids))
+
+        candidates = matched > 0
+        if domain_filter:
+            candidates &= self.domain_mask(domain_filter)
+        rows = np.flatnonzero(candidates)
+        if top_k <= 0 or len(rows) == 0:
+            return rows[:0], np.empty(0), u
+
+        sim = matched[rows] / np.maximum(self.row_len[rows], 1)
+        if top_k < len(rows):
+            # Partial sort, keeping every row tied with the k-th score so the
+            # role_id tie-break below stays deterministic.
+            kth = -np.partition(-sim, top_k - 1)[top_k - 1]
+            keep = sim >= kth
+            rows, sim = rows[keep], sim[keep]
+        order = np.lexsort((self.role_ids[rows], -sim))[:top_k]
+        return rows[order], sim[order], u
+
+    def top_roles_batch(self, skill_id_lists: List[List[int]], domain_filters: List[Optional[str]],
+                        top_ks: List[int]) -> List[tuple]:
+        """
+        top_roles for many users at once: every user's (user, role) hits are
+        counted in one np.unique pass and ranked with one lexsort. Returns one
+        (rows, similarity, user_vector) tuple per user.
+        """
+        n_roles = len(self.role_ids)
+        vectors = [self.user_vector(ids) for ids in skill_id_lists]
+        users, hits = [], []
+        for i, u in enumerate(vectors):
+            for c in np.flatnonzero(u).tolist():
+                postings = self.col_rows[self.col_ptr[c]:self.col_ptr[c + 1]]
+                hits.append(postings)
+                users.append(np.full(len(postings), i, dtype=np.int64))
+        if not hits:
+            return [(np.empty(0, dtype=np.int64), np.empty(0), u) for u in vectors]
+
+        keys, matched = np.unique(np.concatenate(users) * n_roles + np.concatenate(hits), return_counts=True)
+        user_of, rows = np.divmod(keys, n_roles)
+        keep = np.ones(len(keys), dtype=bool)
+        for domain_filter in {f for f in domain_filters if f}:
+            with_filter = np.array([f == domain_filter for f in domain_filters])[user_of]
+            keep[with_filter] &= self.domain_mask(domain_filter)[rows[with_filter]]
+        user_of, rows, matched = user_of[keep], rows[keep], matched[keep]
+
+        sim = matched / np.maximum(self.row_len[rows], 1)
+        order = np.lexsort((self.role_ids[rows], -sim, user_of))
+        user_of, rows, sim = user_of[order], rows[order], sim[order]
+        # Rank within each user's block, then keep that user's top_k.
+        rank = np.arange(len(user_of)) - np.searchsorted(user_of, user_of)
+        take = rank < np.maximum(np.array(top_ks, dtype=np.int64), 0)[user_of]
+        user_of, rows, sim = user_of[take], rows[take], sim[take]
+
+        bounds = np.searchsorted(user_of, np.arange(len(vectors) + 1))
+        return [(rows[bounds[i]:bounds[i + 1]], sim[bounds[i]:bounds[i + 1]], u) for i, u in enumerate(vectors)]
+
+
+def get_role_skill_matrix(db: Session) -> RoleSkillMatrix:
+    def build():
+        skill_index = get_skill_index(db)
+        roles = (
+            db.query(models.JobRole.role_id, models.JobRole.job_title_short, models.JobRole.domain_id)
+            .join(models.Domain, models.Domain.domain_id == models.JobRole.domain_id)
+            .join(models.Branch, models.Branch.branch_id == models.Domain.branch_id)
+            .order_by(models.JobRole.role_id)
+            .all()
+        )
+        domains = (
+            db.query(models.Domain.domain_id, models.Domain.domain,
+                     models.Domain.domain_description, models.Branch.branch_name)
+            .join(models.Branch, models.Branch.branch_id == models.Domain.branch_id)
+            .all()
+        )
+        links = db.query(models.JobRoleSkill.role_id, models.JobRoleSkill.skill_id).all()
+        return RoleSkillMatrix(skill_index, roles, domains, links)
+
+    return _cached(
+        db,
+        "role_skill_matrix",
+        (
+            models.Branch.__tablename__,
+            models.Domain.__tablename__,
+            models.Skill.__tablename__,
+            models.JobRole.__tablename__,
+            models.JobRoleSkill.__tablename__,
+        ),
+        build,
+    )
+
+
+def warm_up(db: Session):
+    """Build every cached catalog index now instead of on the first request."""
+    get_skill_index(db)
+    get_domain_index(db)
+    get_catalog_snapshot(db)
+    get_role_skill_matrix(db)
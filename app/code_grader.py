@@ -0,0 +1,333 @@
+import asyncio
+import json
+import os
+import secrets
+import signal
+import sys
+import tempfile
+import weakref
+from typing import Any, Dict, List, Optional
+
+# Per-submission limits
+GRADER_CPU_SECONDS = int(os.getenv("GRADER_CPU_SECONDS", "2"))
+GRADER_MEMORY_MB = int(os.getenv("GRADER_MEMORY_MB", "256"))
+GRADER_WALL_SECONDS = float(os.getenv("GRADER_WALL_SECONDS", "5"))
+GRADER_CASE_SECONDS = float(os.getenv("GRADER_CASE_SECONDS", "1"))
+GRADER_MAX_SOURCE_BYTES = int(os.getenv("GRADER_MAX_SOURCE_BYTES", "20000"))
+# JSON size of one return value, and of everything read back from the sandbox
+GRADER_MAX_VALUE_BYTES = int(os.getenv("GRADER_MAX_VALUE_BYTES", "65536"))
+GRADER_MAX_OUTPUT_BYTES = int(os.getenv("GRADER_MAX_OUTPUT_BYTES", str(1024 * 1024)))
+# Sandboxed interpreters allowed to run at once (per API process)
+GRADER_MAX_WORKERS = int(os.getenv("GRADER_MAX_WORKERS", str(max(2, (os.cpu_count() or 2) * 2))))
+
+# Runs inside the sandboxed interpreter (python -I -S). It reads the job, then
+# forks the submission process, which gets the function arguments but neither
+# the expected values, the nonce nor the results channel: its stdio is
+# /dev/null, every other fd is closed, and it only starts once the runner has
+# taken the nonce off stdin. It applies the resource limits, defines the
+# submission and calls it once per test case under an interval timer, sending
+# each return value back as JSON over a private pipe. The runner stamps those
+# messages with the nonce and relays them; the parent does the comparing.
+_RUNNER = r'''
+import json, os, signal, sys
+
+def read_line():
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = os.read(0, 1)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+def read_exact(n):
+    data = b""
+    while len(data) < n:
+        chunk = os.read(0, n - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+# Unbuffered reads: the nonce after the job must still be in the pipe when we fork
+job = json.loads(read_exact(int(read_line())))
+values_r, values_w = os.pipe()
+go_r, go_w = os.pipe()
+child = os.fork()
+
+if child == 0:
+    os.close(values_r)
+    os.close(go_w)
+    os.read(go_r, 1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.closerange(3, values_w)
+    os.closerange(values_w + 1, 1 << 16)
+    try:
+        import resource
+        cpu, mem = job["cpu_seconds"], job["memory_bytes"]
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+        resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (16, 16))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    except (ImportError, ValueError, OSError):
+        pass
+
+    values = os.fdopen(values_w, "w")
+    dumps = json.dumps
+    max_value = job["max_value_bytes"]
+
+    class CaseTimeout(BaseException):
+        pass
+
+    def on_alarm(signum, frame):
+        raise CaseTimeout()
+
+    signal.signal(signal.SIGALRM, on_alarm)
+
+    def run(fn, *args):
+        signal.setitimer(signal.ITIMER_REAL, job["case_seconds"])
+        try:
+            return fn(*args)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    def short(e):
+        return (type(e).__name__ + ": " + str(e))[:200]
+
+    # Sent line by line so cases that finished survive a later kill by a resource limit
+    # (and only from this process, should the submission manage to fork)
+    child_pid = os.getpid()
+
+    def send(item):
+        if os.getpid() == child_pid:
+            values.write(dumps(item) + "\n")
+            values.flush()
+
+    header = {"kind": "header", "status": "ok"}
+    namespace = {"__name__": "submission"}
+    try:
+        code = compile(job["code"], "<submission>", "exec")
+        run(exec, code, namespace)
+        fn = namespace.get(job["function"])
+        if not callable(fn):
+            header["status"] = "missing_function"
+    except CaseTimeout:
+        header["status"] = "timeout"
+    except SyntaxError as e:
+        header["status"] = "syntax_error"
+        header["detail"] = short(e)
+    except BaseException as e:
+        header["status"] = "error"
+        header["detail"] = short(e)
+    send(header)
+
+    if header["status"] == "ok":
+        for args in job["args"]:
+            try:
+                # JSON form, so tuples match lists and custom __eq__ has nothing to hook
+                value = run(lambda: dumps(fn(*args), sort_keys=True))
+                if len(value) > max_value:
+                    send({"kind": "case", "status": "error", "detail": "return value too large"})
+                else:
+                    send({"kind": "case", "status": "returned", "value": value})
+            except CaseTimeout:
+                send({"kind": "case", "status": "timeout"})
+            except BaseException as e:
+                send({"kind": "case", "status": "error", "detail": short(e)})
+    send({"kind": "done"})
+    os._exit(0)
+
+os.close(values_w)
+os.close(go_r)
+nonce = read_line().decode("ascii", "replace").strip()
+os.close(0)
+os.write(go_w, b"g")
+os.close(go_w)
+out = os.fdopen(1, "w")
+
+def report(item):
+    item["nonce"] = nonce
+    out.write(json.dumps(item) + "\n")
+    out.flush()
+
+with os.fdopen(values_r, encoding="utf-8", errors="replace") as values:
+    while True:
+        line = values.readline(job["max_value_bytes"] + 1024)
+        if not line.endswith("\n"):
+            break
+        try:
+            item = json.loads(line)
+        except ValueError:
+            break
+        if not isinstance(item, dict) or item.get("kind") not in ("header", "case", "done"):
+            break
+        report(item)
+        if item["kind"] == "done":
+            break
+try:
+    os.kill(child, signal.SIGKILL)
+except ProcessLookupError:
+    pass
+_, status = os.waitpid(child, 0)
+report({"kind": "exit", "code": os.waitstatus_to_exitcode(status)})
+'''
+
+# One semaphore per event loop (the API loop, or asyncio.run() from scripts)
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _limit() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(GRADER_MAX_WORKERS)
+    return semaphore
+
+
+def _kill(proc):
+    # start_new_session=True made the sandbox a process group leader; take any children with it
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def function_name(question: Dict[str, Any]) -> str:
+    """Function the submission must define, taken from the question's signature."""
+    return question["signature"].split("(", 1)[0].strip()
+
+
+def _summary(status: str, cases: List[dict], total: int, detail: Optional[str] = None) -> Dict[str, Any]:
+    if len(cases) < total:
+        cases = cases + [{"status": "not_run"}] * (total - len(cases))
+    for i, case in enumerate(cases):
+        case["case"] = i
+    passed = sum(1 for c in cases if c["status"] == "passed")
+    result = {"status": status, "passed": passed, "total": total, "cases": cases}
+    if detail:
+        result["detail"] = detail
+    return result
+
+
+def _judge(item: dict, case: Dict[str, Any]) -> Dict[str, Any]:
+    """Result of one case from the value the sandbox sent back; only the parent knows `expected`."""
+    status = item.get("status")
+    if status == "returned":
+        passed = item.get("value") == json.dumps(case["expected"], sort_keys=True)
+        return {"status": "passed" if passed else "failed"}
+    if status == "timeout":
+        return {"status": "timeout"}
+    return {"status": "error", "detail": str(item.get("detail") or "")[:200]}
+
+
+_HEADER_STATUSES = {"ok", "syntax_error", "error", "missing_function", "timeout"}
+
+
+async def _exchange(proc, payload: bytes) -> bytes:
+    """Send the job, then read output until EOF or just past GRADER_MAX_OUTPUT_BYTES."""
+    try:
+        proc.stdin.write(payload)
+        await proc.stdin.drain()
+        proc.stdin.close()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    output = bytearray()
+    while len(output) <= GRADER_MAX_OUTPUT_BYTES:
+        chunk = await proc.stdout.read(65536)
+        if not chunk:
+            break
+        output += chunk
+    return bytes(output)
+
+
+# --------------------------
+# Grading
+# --------------------------
+async def grade_submission(code: str, question: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run `code` against the question's test cases in a fresh, isolated Python
+    process with CPU, memory and wall-clock limits. Never raises; problems are
+    reported in `status` (ok, syntax_error, error, missing_function, timeout,
+    killed, too_large) alongside per-case results.
+
+    The sandbox only ever sees the arguments and sends back return values;
+    they are checked against `expected` here. Output lines without this run's
+    nonce did not come from the runner and are ignored.
+    """
+    cases = question["test_cases"]
+    if len(code.encode("utf-8")) > GRADER_MAX_SOURCE_BYTES:
+        return _summary("too_large", [], len(cases))
+
+    nonce = secrets.token_hex(16)
+    job = json.dumps({
+        "code": code,
+        "function": function_name(question),
+        "args": [case["args"] for case in cases],
+        "cpu_seconds": GRADER_CPU_SECONDS,
+        "memory_bytes": GRADER_MEMORY_MB * 1024 * 1024,
+        "case_seconds": GRADER_CASE_SECONDS,
+        "max_value_bytes": GRADER_MAX_VALUE_BYTES,
+    }).encode("utf-8")
+    payload = b"%d\n" % len(job) + job + nonce.encode("ascii") + b"\n"
+
+    async with _limit():
+        with tempfile.TemporaryDirectory(prefix="grader-") as workdir:
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, "-I", "-S", "-c", _RUNNER,
+                stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL, cwd=workdir, env={},
+                start_new_session=True,
+            )
+            try:
+                stdout = await asyncio.wait_for(_exchange(proc, payload), timeout=GRADER_WALL_SECONDS)
+            except asyncio.TimeoutError:
+                _kill(proc)
+                await proc.wait()
+                return _summary("timeout", [], len(cases))
+            except asyncio.CancelledError:
+                _kill(proc)
+                raise
+            # Anything the submission forked off is still in the group
+            _kill(proc)
+            await proc.wait()
+
+    if len(stdout) > GRADER_MAX_OUTPUT_BYTES:
+        return _summary("killed", [], len(cases), "output limit exceeded")
+
+    header, reported, done, exit_code = None, [], False, proc.returncode
+    for line in stdout.splitlines():
+        try:
+            item = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(item, dict) or item.get("nonce") != nonce:
+            continue
+        kind = item.get("kind")
+        if kind == "exit":
+            exit_code = item.get("code")
+        elif done:
+            continue
+        elif kind == "header" and header is None:
+            header = item
+        elif kind == "case" and header is not None and len(reported) < len(cases):
+            reported.append(_judge(item, cases[len(reported)]))
+        elif kind == "done" and header is not None:
+            done = True
+
+    if header is None:
+        # Killed before reporting (SIGXCPU, MemoryError during startup, ...) or garbled output
+        return _summary("killed", [], len(cases), f"exit code {exit_code}")
+    if done:
+        status = header.get("status") if header.get("status") in _HEADER_STATUSES else "error"
+        return _summary(status, reported, len(cases), header.get("detail"))
+    # Died part-way through the cases: keep the ones that were reported
+    return _summary("killed", reported, len(cases), f"exit code {exit_code}")
+
+
+async def grade_many(submissions: List[tuple]) -> List[Dict[str, Any]]:
+    """Grade (code, question) pairs concurrently, at most GRADER_MAX_WORKERS at a time."""
+    return await asyncio.gather(*(grade_submission(code, question) for code, question in submissions))
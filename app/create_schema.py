@@ -0,0 +1,23 @@
+"""
+Create any missing tables. Run once per deploy (or from a release step):
+
+    python -m app.create_schema
+
+The API no longer does this on import; set CREATE_SCHEMA_ON_STARTUP=1 to have
+the app run it during startup instead (handy for local SQLite development).
+"""
+import time
+
+from . import models
+from .database import engine
+
+
+def create_schema():
+    models.Base.metadata.create_all(bind=engine)
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    create_schema()
+    print(f"Schema ready on {engine.url.render_as_string(hide_password=True)} "
+          f"in {time.perf_counter() - started:.2f}s")
@@ -1,5 +1,30 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, func, insert, or_, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from sqlalchemy.orm import Session
 from . import models, schemas
+from .catalog import mark_changed
+
+
+# --------------------------
+# Pagination helper
+# --------------------------
+def _page(query, keys: Sequence, skip: int, limit: int, after: Optional[Sequence[int]]):
+    """
+    Return one page ordered by primary key. With `after` (the key of the last
+    row of the previous page) the page is fetched by keyset, which costs the
+    same at any depth; otherwise it falls back to OFFSET `skip`.
+    """
+    query = query.order_by(*keys)
+    if after is not None:
+        # (k1, k2, ...) > (a1, a2, ...) spelled out so every backend can use the PK index.
+        clauses = []
+        for i, key in enumerate(keys):
+            clauses.append(and_(*[k == v for k, v in zip(keys[:i], after[:i])], key > after[i]))
+        query = query.filter(or_(*clauses))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 
 # --------------------------
@@ -8,12 +33,16 @@ from . import models, schemas
 def create_branch(db: Session, branch: schemas.BranchCreate):
     db_branch = models.Branch(**branch.dict())
     db.add(db_branch)
+    mark_changed(db, models.Branch.__tablename__)
     db.commit()
     db.refresh(db_branch)
     return db_branch
 
-def get_branches(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Branch).offset(skip).limit(limit).all()
+def get_branches(db: Session, skip: int = 0, limit: int = 100, after: Optional[Sequence[int]] = None):
+    return _page(db.query(models.Branch), (models.Branch.branch_id,), skip, limit, after)
+
+def count_branches(db: Session):
+    return db.query(models.Branch).count()
 
 def update_branch(db: Session, branch_id: int, branch: schemas.BranchUpdate):
     db_branch = db.query(models.Branch).filter(models.Branch.branch_id == branch_id).first()
@@ -21,6 +50,7 @@ def update_branch(db: Session, branch_id: int, branch: schemas.BranchUpdate):
         return None
     for key, value in branch.dict(exclude_unset=True).items():
         setattr(db_branch, key, value)
+    mark_changed(db, models.Branch.__tablename__)
     db.commit()
     db.refresh(db_branch)
     return db_branch
@@ -30,6 +60,7 @@ def delete_branch(db: Session, branch_id: int):
     if not db_branch:
         return None
     db.delete(db_branch)
+    mark_changed(db, models.Branch.__tablename__)
     db.commit()
     return db_branch
 
@@ -40,12 +71,23 @@ def delete_branch(db: Session, branch_id: int):
 def create_domain(db: Session, domain: schemas.DomainCreate):
     db_domain = models.Domain(**domain.dict())
     db.add(db_domain)
+    mark_changed(db, models.Domain.__tablename__)
     db.commit()
     db.refresh(db_domain)
     return db_domain
 
-def get_domains(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Domain).offset(skip).limit(limit).all()
+def _domains_query(db: Session, branch_id: Optional[int] = None):
+    query = db.query(models.Domain)
+    if branch_id is not None:
+        query = query.filter(models.Domain.branch_id == branch_id)
+    return query
+
+def get_domains(db: Session, skip: int = 0, limit: int = 100, after: Optional[Sequence[int]] = None,
+                branch_id: Optional[int] = None):
+    return _page(_domains_query(db, branch_id), (models.Domain.domain_id,), skip, limit, after)
+
+def count_domains(db: Session, branch_id: Optional[int] = None):
+    return _domains_query(db, branch_id).count()
 
 def update_domain(db: Session, domain_id: int, domain: schemas.DomainUpdate):
     db_domain = db.query(models.Domain).filter(models.Domain.domain_id == domain_id).first()
@@ -53,6 +95,7 @@ def update_domain(db: Session, domain_id: int, domain: schemas.DomainUpdate):
         return None
     for key, value in domain.dict(exclude_unset=True).items():
         setattr(db_domain, key, value)
+    mark_changed(db, models.Domain.__tablename__)
     db.commit()
     db.refresh(db_domain)
     return db_domain
@@ -62,6 +105,7 @@ def delete_domain(db: Session, domain_id: int):
     if not db_domain:
         return None
     db.delete(db_domain)
+    mark_changed(db, models.Domain.__tablename__)
     db.commit()
     return db_domain
 
@@ -72,12 +116,16 @@ def delete_domain(db: Session, domain_id: int):
 def create_skill(db: Session, skill: schemas.SkillCreate):
     db_skill = models.Skill(**skill.dict())
     db.add(db_skill)
+    mark_changed(db, models.Skill.__tablename__)
     db.commit()
     db.refresh(db_skill)
     return db_skill
 
-def get_skills(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Skill).offset(skip).limit(limit).all()
+def get_skills(db: Session, skip: int = 0, limit: int = 100, after: Optional[Sequence[int]] = None):
+    return _page(db.query(models.Skill), (models.Skill.skill_id,), skip, limit, after)
+
+def count_skills(db: Session):
+    return db.query(models.Skill).count()
 
 def update_skill(db: Session, skill_id: int, skill: schemas.SkillUpdate):
     db_skill = db.query(models.Skill).filter(models.Skill.skill_id == skill_id).first()
@@ -85,6 +133,7 @@ def update_skill(db: Session, skill_id: int, skill: schemas.SkillUpdate):
         return None
     for key, value in skill.dict(exclude_unset=True).items():
         setattr(db_skill, key, value)
+    mark_changed(db, models.Skill.__tablename__)
     db.commit()
     db.refresh(db_skill)
     return db_skill
@@ -94,6 +143,7 @@ def delete_skill(db: Session, skill_id: int):
     if not db_skill:
         return None
     db.delete(db_skill)
+    mark_changed(db, models.Skill.__tablename__, models.JobRoleSkill.__tablename__)
     db.commit()
     return db_skill
 
@@ -104,12 +154,23 @@ def delete_skill(db: Session, skill_id: int):
 def create_job_role(db: Session, job_role: schemas.JobRoleCreate):
     db_job_role = models.JobRole(**job_role.dict())
     db.add(db_job_role)
+    mark_changed(db, models.JobRole.__tablename__)
     db.commit()
     db.refresh(db_job_role)
     return db_job_role
 
-def get_job_roles(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.JobRole).offset(skip).limit(limit).all()
+def _job_roles_query(db: Session, domain_id: Optional[int] = None):
+    query = db.query(models.JobRole)
+    if domain_id is not None:
+        query = query.filter(models.JobRole.domain_id == domain_id)
+    return query
+
+def get_job_roles(db: Session, skip: int = 0, limit: int = 100, after: Optional[Sequence[int]] = None,
+                  domain_id: Optional[int] = None):
+    return _page(_job_roles_query(db, domain_id), (models.JobRole.role_id,), skip, limit, after)
+
+def count_job_roles(db: Session, domain_id: Optional[int] = None):
+    return _job_roles_query(db, domain_id).count()
 
 def update_job_role(db: Session, role_id: int, job_role: schemas.JobRoleUpdate):
     db_job_role = db.query(models.JobRole).filter(models.JobRole.role_id == role_id).first()
@@ -117,6 +178,7 @@ def update_job_role(db: Session, role_id: int, job_role: schemas.JobRoleUpdate):
         return None
     for key, value in job_role.dict(exclude_unset=True).items():
         setattr(db_job_role, key, value)
+    mark_changed(db, models.JobRole.__tablename__)
     db.commit()
     db.refresh(db_job_role)
     return db_job_role
@@ -126,6 +188,7 @@ def delete_job_role(db: Session, role_id: int):
     if not db_job_role:
         return None
     db.delete(db_job_role)
+    mark_changed(db, models.JobRole.__tablename__, models.JobRoleSkill.__tablename__)
     db.commit()
     return db_job_role
 
@@ -136,11 +199,28 @@ def delete_job_role(db: Session, role_id: int):
 def create_job_role_skill(db: Session, job_role_skill: schemas.JobRoleSkillCreate):
     db_jrs = models.JobRoleSkill(**job_role_skill.dict())
     db.add(db_jrs)
+    mark_changed(db, models.JobRoleSkill.__tablename__)
     db.commit()
     return db_jrs
 
-def get_job_role_skills(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.JobRoleSkill).offset(skip).limit(limit).all()
+def _job_role_skills_query(db: Session, role_id: Optional[int] = None, skill_id: Optional[int] = None):
+    query = db.query(models.JobRoleSkill)
+    if role_id is not None:
+        query = query.filter(models.JobRoleSkill.role_id == role_id)
+    if skill_id is not None:
+        query = query.filter(models.JobRoleSkill.skill_id == skill_id)
+    return query
+
+def get_job_role_skills(db: Session, skip: int = 0, limit: int = 100, after: Optional[Sequence[int]] = None,
+                        role_id: Optional[int] = None, skill_id: Optional[int] = None):
+    return _page(
+        _job_role_skills_query(db, role_id, skill_id),
+        (models.JobRoleSkill.role_id, models.JobRoleSkill.skill_id),
+        skip, limit, after,
+    )
+
+def count_job_role_skills(db: Session, role_id: Optional[int] = None, skill_id: Optional[int] = None):
+    return _job_role_skills_query(db, role_id, skill_id).count()
 
 def delete_job_role_skill(db: Session, role_id: int, skill_id: int):
     db_jrs = db.query(models.JobRoleSkill).filter(
@@ -150,5 +230,272 @@ def delete_job_role_skill(db: Session, role_id: int, skill_id: int):
     if not db_jrs:
         return None
     db.delete(db_jrs)
+    mark_changed(db, models.JobRoleSkill.__tablename__)
     db.commit()
     return db_jrs
+
+
+# --------------------------
+# Bulk upserts
+# --------------------------
+# Each bulk call validates the whole list up front, reads existing rows with a
+# few IN queries, writes with executemany and commits once. The result is one
+# status dict per input item, in input order.
+BULK_MAX_ITEMS = 10000
+_IN_CHUNK = 1000
+
+
+def _chunks(seq: Sequence, size: int = _IN_CHUNK):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _status(index: int, status: str, id: Optional[int] = None, detail: Optional[str] = None) -> dict:
+    return {"index": index, "status": status, "id": id, "detail": detail}
+
+
+def _existing_ids(db: Session, pk, column, values: Sequence) -> Dict:
+    found = {}
+    for chunk in _chunks(list(values)):
+        found.update({value: id_ for id_, value in db.query(pk, column).filter(column.in_(chunk)).all()})
+    return found
+
+
+def _name_key(name: str) -> str:
+    # Unique name columns use MySQL's case-insensitive collation, so "Python" and "python" are one row.
+    # lower(), not casefold(): it must fold the same way as the SQL lower() in _existing_by_name.
+    return name.strip().lower()
+
+
+def _existing_by_name(db: Session, model, column, names: Sequence[str]) -> Dict[str, object]:
+    """{name key: row} for stored rows whose name matches one of `names` ignoring case."""
+    found = {}
+    # Exact names too: SQLite's lower() only folds ASCII
+    for chunk in _chunks(sorted({n for name in names for n in (name.strip(), _name_key(name))})):
+        for row in db.query(model).filter(or_(func.lower(column).in_(chunk), column.in_(chunk))).all():
+            found[_name_key(getattr(row, column.key))] = row
+    return found
+
+
+def _insert_on_conflict(db: Session, model, rows: List[dict], key_columns: Sequence[str],
+                        update_columns: Sequence[str] = ()):
+    """
+    Multi-row INSERT that skips rows clashing with the unique `key_columns`, or
+    updates their `update_columns`, so two loads running at once both succeed
+    instead of one failing on the constraint.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(model)
+        # Setting the key to itself is MySQL's "do nothing" (INSERT IGNORE would hide other errors too)
+        values = {c: stmt.inserted[c] for c in update_columns} or {key_columns[0]: getattr(model, key_columns[0])}
+        stmt = stmt.on_duplicate_key_update(values)
+    elif dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(model)
+        if update_columns:
+            stmt = stmt.on_conflict_do_update(index_elements=list(key_columns),
+                                              set_={c: stmt.excluded[c] for c in update_columns})
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(key_columns))
+    else:
+        stmt = insert(model)
+    db.execute(stmt, rows)
+
+
+def bulk_upsert_skills(db: Session, skills: List[schemas.SkillCreate]) -> List[dict]:
+    """Insert skills whose name is new (ignoring case); existing names are reported as `exists`."""
+    results: List[Optional[dict]] = [None] * len(skills)
+    first_index: Dict[str, int] = {}
+    for i, item in enumerate(skills):
+        key = _name_key(item.skill_name)
+        if not key:
+            results[i] = _status(i, "error", detail="skill_name is empty")
+        elif key in first_index:
+            results[i] = _status(i, "duplicate", detail=f"same as item {first_index[key]}")
+        else:
+            first_index[key] = i
+
+    existing = {key: row.skill_id for key, row in
+                _existing_by_name(db, models.Skill, models.Skill.skill_name,
+                                  [skills[i].skill_name for i in first_index.values()]).items()}
+    new_names = [skills[i].skill_name.strip() for key, i in first_index.items() if key not in existing]
+    if new_names:
+        _insert_on_conflict(db, models.Skill, [{"skill_name": name} for name in new_names], ("skill_name",))
+        created = {key: row.skill_id for key, row in
+                   _existing_by_name(db, models.Skill, models.Skill.skill_name, new_names).items()}
+        mark_changed(db, models.Skill.__tablename__)
+    else:
+        created = {}
+    db.commit()
+
+    for key, i in first_index.items():
+        if key in existing:
+            results[i] = _status(i, "exists", existing[key])
+        elif key in created:
+            results[i] = _status(i, "created", created[key])
+        else:
+            # Skipped by the unique constraint: the database's collation saw it as an existing name
+            results[i] = _status(i, "exists")
+    for i, item in enumerate(skills):
+        if results[i]["status"] == "duplicate":
+            results[i]["id"] = results[first_index[_name_key(item.skill_name)]]["id"]
+    return results
+
+
+def bulk_upsert_domains(db: Session, domains: List[schemas.DomainCreate]) -> List[dict]:
+    """Insert new domains and update description/branch of existing ones (matched by name, ignoring case)."""
+    results: List[Optional[dict]] = [None] * len(domains)
+    branch_ids = set(_existing_ids(db, models.Branch.branch_id, models.Branch.branch_id,
+                                   {d.branch_id for d in domains}))
+    first_index: Dict[str, int] = {}
+    for i, item in enumerate(domains):
+        key = _name_key(item.domain)
+        if not key:
+            results[i] = _status(i, "error", detail="domain is empty")
+        elif item.branch_id not in branch_ids:
+            results[i] = _status(i, "error", detail=f"branch_id {item.branch_id} not found")
+        elif key in first_index:
+            results[i] = _status(i, "duplicate", detail=f"same as item {first_index[key]}")
+        else:
+            first_index[key] = i
+
+    existing = _existing_by_name(db, models.Domain, models.Domain.domain,
+                                 [domains[i].domain for i in first_index.values()])
+
+    inserts, updates = [], []
+    for key, i in first_index.items():
+        item = domains[i]
+        row = existing.get(key)
+        if row is None:
+            inserts.append({"domain": item.domain.strip(), "domain_description": item.domain_description,
+                            "branch_id": item.branch_id})
+        elif (row.domain_description, row.branch_id) != (item.domain_description, item.branch_id):
+            updates.append({"domain_id": row.domain_id, "domain_description": item.domain_description,
+                            "branch_id": item.branch_id})
+            results[i] = _status(i, "updated", row.domain_id)
+        else:
+            results[i] = _status(i, "unchanged", row.domain_id)
+
+    if inserts:
+        # A load running at the same time may insert the same domain first: update it instead
+        _insert_on_conflict(db, models.Domain, inserts, ("domain",), ("domain_description", "branch_id"))
+    if updates:
+        db.execute(update(models.Domain), updates)
+    created = _existing_by_name(db, models.Domain, models.Domain.domain,
+                                [row["domain"] for row in inserts]) if inserts else {}
+    if inserts or updates:
+        mark_changed(db, models.Domain.__tablename__)
+    db.commit()
+
+    for row in inserts:
+        key = _name_key(row["domain"])
+        i = first_index[key]
+        results[i] = _status(i, "created", created[key].domain_id) if key in created else _status(i, "updated")
+    for i, item in enumerate(domains):
+        if results[i]["status"] == "duplicate":
+            results[i]["id"] = results[first_index[_name_key(item.domain)]]["id"]
+    return results
+
+
+def bulk_upsert_job_roles(db: Session, job_roles: List[schemas.JobRoleCreate]) -> List[dict]:
+    """
+    Insert job roles, treating (domain_id, job_title_short) as the natural key:
+    a role that already exists in that domain has its description updated.
+    """
+    results: List[Optional[dict]] = [None] * len(job_roles)
+    domain_ids = set(_existing_ids(db, models.Domain.domain_id, models.Domain.domain_id,
+                                   {r.domain_id for r in job_roles}))
+    first_index: Dict[Tuple[int, str], int] = {}
+    for i, item in enumerate(job_roles):
+        key = (item.domain_id, item.job_title_short.strip())
+        if not key[1]:
+            results[i] = _status(i, "error", detail="job_title_short is empty")
+        elif item.domain_id not in domain_ids:
+            results[i] = _status(i, "error", detail=f"domain_id {item.domain_id} not found")
+        elif key in first_index:
+            results[i] = _status(i, "duplicate", detail=f"same as item {first_index[key]}")
+        else:
+            first_index[key] = i
+
+    def load(keys) -> Dict[Tuple[int, str], models.JobRole]:
+        rows = {}
+        titles = {title for _, title in keys}
+        for chunk in _chunks(list(titles)):
+            query = db.query(models.JobRole).filter(
+                models.JobRole.job_title_short.in_(chunk),
+                models.JobRole.domain_id.in_({d for d, _ in keys}),
+            )
+            for row in query.all():
+                if (row.domain_id, row.job_title_short) in keys:
+                    rows[(row.domain_id, row.job_title_short)] = row
+        return rows
+
+    existing = load(set(first_index))
+    inserts, updates = [], []
+    for key, i in first_index.items():
+        item = job_roles[i]
+        row = existing.get(key)
+        if row is None:
+            inserts.append({"job_title_short": key[1], "domain_id": key[0],
+                            "job_description": item.job_description})
+        elif row.job_description != item.job_description:
+            updates.append({"role_id": row.role_id, "job_description": item.job_description})
+            results[i] = _status(i, "updated", row.role_id)
+        else:
+            results[i] = _status(i, "unchanged", row.role_id)
+
+    if inserts:
+        db.execute(insert(models.JobRole), inserts)
+    if updates:
+        db.execute(update(models.JobRole), updates)
+    created = load({(row["domain_id"], row["job_title_short"]) for row in inserts}) if inserts else {}
+    if inserts or updates:
+        mark_changed(db, models.JobRole.__tablename__)
+    db.commit()
+
+    for row in inserts:
+        key = (row["domain_id"], row["job_title_short"])
+        i = first_index[key]
+        results[i] = _status(i, "created", created[key].role_id if key in created else None)
+    for i, item in enumerate(job_roles):
+        if results[i]["status"] == "duplicate":
+            key = (item.domain_id, item.job_title_short.strip())
+            results[i]["id"] = results[first_index[key]]["id"]
+    return results
+
+
+def bulk_create_job_role_skills(db: Session, mappings: List[schemas.JobRoleSkillCreate]) -> List[dict]:
+    """Insert role-skill links; links that already exist are reported as `exists`."""
+    results: List[Optional[dict]] = [None] * len(mappings)
+    role_ids = set(_existing_ids(db, models.JobRole.role_id, models.JobRole.role_id,
+                                 {m.role_id for m in mappings}))
+    skill_ids = set(_existing_ids(db, models.Skill.skill_id, models.Skill.skill_id,
+                                  {m.skill_id for m in mappings}))
+    first_index: Dict[Tuple[int, int], int] = {}
+    for i, item in enumerate(mappings):
+        key = (item.role_id, item.skill_id)
+        if item.role_id not in role_ids:
+            results[i] = _status(i, "error", detail=f"role_id {item.role_id} not found")
+        elif item.skill_id not in skill_ids:
+            results[i] = _status(i, "error", detail=f"skill_id {item.skill_id} not found")
+        elif key in first_index:
+            results[i] = _status(i, "duplicate", detail=f"same as item {first_index[key]}")
+        else:
+            first_index[key] = i
+
+    existing = set()
+    for chunk in _chunks(sorted({r for r, _ in first_index})):
+        query = db.query(models.JobRoleSkill.role_id, models.JobRoleSkill.skill_id).filter(
+            models.JobRoleSkill.role_id.in_(chunk)
+        )
+        existing.update((r, s) for r, s in query.all() if (r, s) in first_index)
+
+    inserts = [{"role_id": r, "skill_id": s} for (r, s) in first_index if (r, s) not in existing]
+    if inserts:
+        _insert_on_conflict(db, models.JobRoleSkill, inserts, ("role_id", "skill_id"))
+        mark_changed(db, models.JobRoleSkill.__tablename__)
+    db.commit()
+
+    for key, i in first_index.items():
+        results[i] = _status(i, "exists" if key in existing else "created")
+    return results
@@ -0,0 +1,9 @@
+import os
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """Boolean setting from the environment: 1/true/yes/on (any case) is True; unset gives `default`."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,40 @@
+import hashlib
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from .catalog import table_version
+
+
+# --------------------------
+# Conditional GET helpers
+# --------------------------
+def if_none_match(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match header matches `etag` (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == tag:
+            return True
+    return False
+
+
+def table_etag(request: Request, db: Session, *tables: str) -> str:
+    """
+    Strong ETag for a list endpoint: table versions plus the query parameters.
+    Versions are shared through the database, so every worker issues the same tag.
+    """
+    versions = "-".join(table_version(db, t) for t in tables)
+    query = hashlib.sha1(str(sorted(request.query_params.multi_items())).encode("utf-8")).hexdigest()[:12]
+    return f'"{versions}-{query}"'
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
@@ -0,0 +1,366 @@
+"""
+Streaming importer for the branch -> domain -> job role -> skill taxonomy.
+
+    python -m app.import_taxonomy taxonomy.csv
+    python -m app.import_taxonomy taxonomy.jsonl --dry-run
+    python -m app.import_taxonomy taxonomy.csv --resume
+
+Each record names a branch, domain, job title and its skills. CSV files need a
+header with `branch`, `domain` and `job_title` columns, plus optional
+`domain_description`, `job_description` and either `skill` (one per row) or
+`skills` (separated by ";" or "|"). JSONL records use the same keys, and
+`skills` may be a list.
+
+The input is read incrementally and written in chunks, one transaction per
+chunk. Name -> id maps are kept in memory, so memory grows with the size of the
+catalog and not with the size of the input. After every committed chunk the
+byte offset is saved to a checkpoint file, and --resume continues from there.
+Re-running a chunk is harmless because existing rows are detected and skipped.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from . import models
+from .catalog import mark_changed
+from .database import SessionLocal
+
+_SKILL_SPLIT = re.compile(r"[;|]")
+_IN_CHUNK = 1000
+
+
+# --------------------------
+# Input streaming
+# --------------------------
+class _LineReader:
+    """Yield decoded lines from a binary file while tracking the byte offset consumed."""
+
+    def __init__(self, f, offset: int):
+        self.f = f
+        self.offset = offset
+        f.seek(offset)
+
+    def __iter__(self) -> Iterator[str]:
+        for line in self.f:
+            self.offset += len(line)
+            yield line.decode("utf-8-sig" if self.offset == len(line) else "utf-8")
+
+
+def _skills_of(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [s.strip() for s in _SKILL_SPLIT.split(str(value)) if s.strip()]
+
+
+def _normalize(raw: dict) -> Optional[dict]:
+    branch = (raw.get("branch") or raw.get("branch_name") or "").strip()
+    domain = (raw.get("domain") or "").strip()
+    title = (raw.get("job_title") or raw.get("job_title_short") or "").strip()
+    if not (branch and domain and title):
+        return None
+    return {
+        "branch": branch,
+        "domain": domain,
+        "domain_description": (raw.get("domain_description") or "").strip() or None,
+        "job_title": title,
+        "job_description": (raw.get("job_description") or "").strip() or None,
+        "skills": _skills_of(raw.get("skills")) + _skills_of(raw.get("skill")),
+    }
+
+
+def iter_records(path: str, fmt: str, offset: int = 0,
+                 header: Optional[List[str]] = None) -> Iterator[Tuple[Optional[dict], int, Optional[List[str]]]]:
+    """
+    Yield (record or None if invalid, byte offset just past the record, csv header).
+    Starting at a non-zero `offset` requires the CSV `header` saved in the checkpoint.
+    """
+    with open(path, "rb") as f:
+        lines = _LineReader(f, offset)
+        if fmt == "jsonl":
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    raw = json.loads(line)
+                except ValueError:
+                    yield None, lines.offset, None
+                    continue
+                yield (_normalize(raw) if isinstance(raw, dict) else None), lines.offset, None
+        else:
+            reader = csv.reader(lines)
+            if header is None:
+                header = [h.strip().lower() for h in next(reader, [])]
+            for row in reader:
+                if not any(cell.strip() for cell in row):
+                    continue
+                yield _normalize(dict(zip(header, row))), lines.offset, header
+
+
+# --------------------------
+# Importer
+# --------------------------
+class TaxonomyImporter:
+    """Resolves names to ids with in-memory maps and writes each chunk in one transaction."""
+
+    def __init__(self, db, dry_run: bool = False):
+        self.db = db
+        self.dry_run = dry_run
+        self.counts = {"branches": 0, "domains": 0, "job_roles": 0, "skills": 0, "links": 0}
+        self.samples: Dict[str, List[str]] = {k: [] for k in self.counts}
+        self._fake_id = 0
+        self._planned_links = set()  # dry-run only: links "created" by earlier chunks
+        self.load_maps()
+
+    def load_maps(self):
+        db = self.db
+        self.branches = {n.lower(): i for i, n in db.query(models.Branch.branch_id, models.Branch.branch_name)}
+        self.domains = {n.lower(): i for i, n in db.query(models.Domain.domain_id, models.Domain.domain)}
+        self.skills = {n.lower(): i for i, n in db.query(models.Skill.skill_id, models.Skill.skill_name)}
+        self.roles = {
+            (d, t.lower()): i
+            for i, d, t in db.query(models.JobRole.role_id, models.JobRole.domain_id, models.JobRole.job_title_short)
+        }
+
+    def _note(self, kind: str, label: str):
+        self.counts[kind] += 1
+        if len(self.samples[kind]) < 20:
+            self.samples[kind].append(label)
+
+    def _insert(self, kind: str, model, rows: List[dict], key_of) -> Dict:
+        """Insert `rows` (executemany) and return {key: new id}; fake ids in dry-run mode."""
+        if not rows:
+            return {}
+        if self.dry_run:
+            ids = {}
+            for row in rows:
+                self._fake_id -= 1
+                ids[key_of(row)] = self._fake_id
+            return ids
+        self.db.execute(insert(model), rows)
+        return {}
+
+    def _reselect(self, pk, name_col, names: List[str], extra=None) -> List[tuple]:
+        found = []
+        for i in range(0, len(names), _IN_CHUNK):
+            query = self.db.query(pk, name_col, *([extra] if extra is not None else []))
+            found.extend(query.filter(name_col.in_(names[i:i + _IN_CHUNK])).all())
+        return found
+
+    def process_chunk(self, records: List[dict]):
+        db = self.db
+        counts_before = dict(self.counts)
+
+        # Branches
+        new = {}
+        for r in records:
+            key = r["branch"].lower()
+            if key not in self.branches and key not in new:
+                new[key] = {"branch_name": r["branch"]}
+                self._note("branches", r["branch"])
+        self.branches.update(self._insert("branches", models.Branch, list(new.values()),
+                                          lambda row: row["branch_name"].lower()))
+        if new and not self.dry_run:
+            for i, n in self._reselect(models.Branch.branch_id, models.Branch.branch_name,
+                                       [row["branch_name"] for row in new.values()]):
+                self.branches[n.lower()] = i
+
+        # Domains
+        new = {}
+        for r in records:
+            key = r["domain"].lower()
+            if key not in self.domains and key not in new:
+                new[key] = {"domain": r["domain"], "domain_description": r["domain_description"],
+                            "branch_id": self.branches[r["branch"].lower()]}
+                self._note("domains", r["domain"])
+        self.domains.update(self._insert("domains", models.Domain, list(new.values()),
+                                         lambda row: row["domain"].lower()))
+        if new and not self.dry_run:
+            for i, n in self._reselect(models.Domain.domain_id, models.Domain.domain,
+                                       [row["domain"] for row in new.values()]):
+                self.domains[n.lower()] = i
+
+        # Skills
+        new = {}
+        for r in records:
+            for skill in r["skills"]:
+                key = skill.lower()
+                if key not in self.skills and key not in new:
+                    new[key] = {"skill_name": skill}
+                    self._note("skills", skill)
+        self.skills.update(self._insert("skills", models.Skill, list(new.values()),
+                                        lambda row: row["skill_name"].lower()))
+        if new and not self.dry_run:
+            for i, n in self._reselect(models.Skill.skill_id, models.Skill.skill_name,
+                                       [row["skill_name"] for row in new.values()]):
+                self.skills[n.lower()] = i
+
+        # Job roles, keyed by (domain_id, title)
+        new = {}
+        for r in records:
+            key = (self.domains[r["domain"].lower()], r["job_title"].lower())
+            if key not in self.roles and key not in new:
+                new[key] = {"job_title_short": r["job_title"], "domain_id": key[0],
+                            "job_description": r["job_description"]}
+                self._note("job_roles", f"{r['domain']} / {r['job_title']}")
+        self.roles.update(self._insert("job_roles", models.JobRole, list(new.values()),
+                                       lambda row: (row["domain_id"], row["job_title_short"].lower())))
+        if new and not self.dry_run:
+            wanted = set(new)
+            for i, t, d in self._reselect(models.JobRole.role_id, models.JobRole.job_title_short,
+                                          sorted({row["job_title_short"] for row in new.values()}),
+                                          models.JobRole.domain_id):
+                if (d, t.lower()) in wanted:
+                    self.roles[(d, t.lower())] = i
+
+        # Links: only rows for roles touched by this chunk are read back
+        pairs = {}
+        for r in records:
+            role_id = self.roles[(self.domains[r["domain"].lower()], r["job_title"].lower())]
+            for skill in r["skills"]:
+                pairs[(role_id, self.skills[skill.lower()])] = (r["job_title"], skill)
+        existing = set()
+        real_roles = sorted({role_id for role_id, _ in pairs if role_id > 0})
+        for i in range(0, len(real_roles), _IN_CHUNK):
+            query = db.query(models.JobRoleSkill.role_id, models.JobRoleSkill.skill_id).filter(
+                models.JobRoleSkill.role_id.in_(real_roles[i:i + _IN_CHUNK])
+            )
+            existing.update(query.all())
+        if self.dry_run:
+            existing |= self._planned_links
+            self._planned_links.update(pairs)
+        links = []
+        for (role_id, skill_id), (title, skill) in pairs.items():
+            if (role_id, skill_id) not in existing:
+                links.append({"role_id": role_id, "skill_id": skill_id})
+                self._note("links", f"{title} -> {skill}")
+        if links and not self.dry_run:
+            db.execute(insert(models.JobRoleSkill), links)
+
+        if not self.dry_run:
+            # Bump the shared table versions with the chunk so running API workers refresh their caches
+            tables = {"branches": models.Branch, "domains": models.Domain, "job_roles": models.JobRole,
+                      "skills": models.Skill, "links": models.JobRoleSkill}
+            changed = [model.__tablename__ for kind, model in tables.items() if self.counts[kind] != counts_before[kind]]
+            if changed:
+                mark_changed(db, *changed)
+            db.commit()
+
+
+# --------------------------
+# Checkpoints
+# --------------------------
+def _file_identity(path: str) -> dict:
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime}
+
+
+def _load_checkpoint(checkpoint: str, path: str) -> dict:
+    with open(checkpoint) as f:
+        state = json.load(f)
+    if state.get("file") != _file_identity(path):
+        raise SystemExit(f"Checkpoint {checkpoint} belongs to a different or modified input file")
+    return state
+
+
+def _save_checkpoint(checkpoint: str, state: dict):
+    tmp = checkpoint + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, checkpoint)
+
+
+# --------------------------
+# CLI
+# --------------------------
+def run(path: str, fmt: str, chunk_size: int, dry_run: bool, resume: bool,
+        checkpoint: str, progress_every: float) -> dict:
+    state = {"file": _file_identity(path), "offset": 0, "records": 0, "invalid": 0, "header": None}
+    if resume:
+        if dry_run:
+            raise SystemExit("--resume cannot be combined with --dry-run")
+        if os.path.exists(checkpoint):
+            state = _load_checkpoint(checkpoint, path)
+            print(f"Resuming at byte {state['offset']} after {state['records']} records", file=sys.stderr)
+
+    db = SessionLocal()
+    try:
+        importer = TaxonomyImporter(db, dry_run=dry_run)
+        started = last_report = time.monotonic()
+        records_at_start = state["records"]
+        chunk: List[dict] = []
+        offset = state["offset"]
+
+        def flush():
+            importer.process_chunk(chunk)
+            state["records"] += len(chunk)
+            state["offset"] = offset
+            chunk.clear()
+            if not dry_run:
+                _save_checkpoint(checkpoint, state)
+
+        for record, offset, header in iter_records(path, fmt, state["offset"], state["header"]):
+            state["header"] = header
+            if record is None:
+                state["invalid"] += 1
+                continue
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                flush()
+                now = time.monotonic()
+                if now - last_report >= progress_every:
+                    last_report = now
+                    rate = (state["records"] - records_at_start) / (now - started)
+                    print(f"{state['records']} records ({rate:,.0f}/s) " + " ".join(
+                        f"{k}+{v}" for k, v in importer.counts.items()), file=sys.stderr)
+        if chunk:
+            flush()
+        else:
+            state["offset"] = offset
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    elapsed = time.monotonic() - started
+    if not dry_run and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return {
+        "dry_run": dry_run,
+        "records": state["records"],
+        "invalid_records": state["invalid"],
+        "seconds": round(elapsed, 2),
+        "records_per_second": round((state["records"] - records_at_start) / elapsed) if elapsed else None,
+        "new": importer.counts,
+        "samples": importer.samples if dry_run else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a branch/domain/job role/skill taxonomy file.")
+    parser.add_argument("path", help="CSV or JSONL file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="records per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be created, write nothing")
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <path>.checkpoint.json)")
+    parser.add_argument("--progress-every", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("jsonl" if args.path.lower().endswith((".jsonl", ".ndjson")) else "csv")
+    checkpoint = args.checkpoint or args.path + ".checkpoint.json"
+    summary = run(args.path, fmt, args.chunk_size, args.dry_run, args.resume, checkpoint, args.progress_every)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,149 @@
-from fastapi import FastAPI
-from . import models, database
+import time
 
-from .routers import domains, skills, job_roles, job_role_skills, branch, tests, recommendations
+_IMPORT_STARTED = time.perf_counter()
 
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel
+
+from . import database
+from .catalog import warm_up
+from .create_schema import create_schema
+from .env import env_bool
+from .metrics import MetricsMiddleware, render_metrics
+from .question_pool import QUESTION_POOL_ENABLED, question_pool
+from .summarizer import shutdown_llm_pool
+from .summary_jobs import summary_jobs
 
-# Create DB tables
-models.Base.metadata.create_all(bind=database.engine)
+from .routers import domains, skills, job_roles, job_role_skills, branch, tests, recommendations, catalog, export
+
+# Startup behaviour (schema creation is an explicit step: python -m app.create_schema)
+CREATE_SCHEMA_ON_STARTUP = env_bool("CREATE_SCHEMA_ON_STARTUP", False)
+WARMUP_ON_STARTUP = env_bool("WARMUP_ON_STARTUP", False)
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "2"))
+READINESS_DB_TIMEOUT_SECONDS = float(os.getenv("READINESS_DB_TIMEOUT_SECONDS", "2"))
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FRONTEND_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "frontend"))  # two levels up
 
-app = FastAPI(title='AspireNextGen API')
 
 # --------------------------
-# Include Routers
+# Lifespan
 # --------------------------
-app.include_router(domains.router)
-app.include_router(skills.router)
-app.include_router(job_roles.router)
-app.include_router(job_role_skills.router)
-app.include_router(branch.router)
-app.include_router(tests.router)
-app.include_router(recommendations.router)
+def _warm_up_catalog():
+    db = database.SessionLocal()
+    try:
+        warm_up(db)
+    finally:
+        db.close()
+
+
+async def _run_warm_up(state):
+    started = time.perf_counter()
+    try:
+        await run_in_threadpool(_warm_up_catalog)
+        state.warmup = "done"
+    except Exception as e:
+        # Indexes still build lazily on the first request that needs them.
+        print("=== ERROR: catalog warm-up failed ===", str(e))
+        state.warmup = "failed"
+    state.warmup_seconds = round(time.perf_counter() - started, 3)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup stays cheap: no DB round trips unless asked for. Warm-up runs in the
+    background and /readyz reports not-ready until it has finished.
+    """
+    state = app.state
+    state.warmup = "disabled"
+    state.warmup_seconds = None
+    if CREATE_SCHEMA_ON_STARTUP:
+        await run_in_threadpool(create_schema)
+    warmup_task = None
+    if WARMUP_ON_STARTUP:
+        state.warmup = "running"
+        warmup_task = asyncio.create_task(_run_warm_up(state))
+    if QUESTION_POOL_ENABLED:
+        # Background threads; the first tests may come from the bank until buffers fill
+        await run_in_threadpool(question_pool.start)
+
+    state.startup_seconds = round(time.perf_counter() - _IMPORT_STARTED, 3)
+    if state.startup_seconds > STARTUP_BUDGET_SECONDS:
+        print(f"=== WARNING: startup took {state.startup_seconds:.2f}s, "
+              f"budget is {STARTUP_BUDGET_SECONDS:.2f}s ===")
+    else:
+        print(f"Startup finished in {state.startup_seconds:.2f}s (budget {STARTUP_BUDGET_SECONDS:.2f}s)")
+
+    yield
+
+    if warmup_task is not None:
+        warmup_task.cancel()
+    summary_jobs.shutdown()
+    await run_in_threadpool(question_pool.stop)
+    shutdown_llm_pool()
+    database.engine.dispose()
+
+
+# --------------------------
+# Probes + operational endpoints
+# --------------------------
+ops = APIRouter(tags=["ops"])
+
+
+@ops.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving. Never touches the database."""
+    return {"status": "ok"}
+
+
+@ops.get("/readyz")
+async def readyz(request: Request):
+    """Readiness: the database answers and the optional catalog warm-up has finished."""
+    state = request.app.state
+    checks = {"warmup": state.warmup}
+    try:
+        await asyncio.wait_for(run_in_threadpool(database.ping), timeout=READINESS_DB_TIMEOUT_SECONDS)
+        checks["database"] = "ok"
+    except asyncio.TimeoutError:
+        checks["database"] = "timeout"
+    except Exception as e:
+        checks["database"] = f"error: {e}"
+
+    ready = checks["database"] == "ok" and state.warmup != "running"
+    body = {
+        "status": "ready" if ready else "not ready",
+        "checks": checks,
+        "startup_seconds": state.startup_seconds,
+        "warmup_seconds": state.warmup_seconds,
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+
+@ops.get("/db/pool")
+async def db_pool_status():
+    """Connection pool occupancy, checkout wait times and timeouts."""
+    return database.pool_status()
+
+
+@ops.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint: stage, route and LLM latency histograms, LLM failures, DB pool usage."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 
 # ---------------------------------------------------
-# CORS + Dummy Auth
+# Dummy Auth
 # ---------------------------------------------------
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # in production, restrict to frontend domain
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+misc = APIRouter()
 
 # Dummy user storage
 users = {}
@@ -58,40 +168,68 @@ class UserProfile(BaseModel):
     examResults: str
     interests: list
 
-@app.post("/auth/signup")
+@misc.post("/auth/signup")
 async def signup(user: UserSignup):
     users[user.email] = {"name": user.name, "password": user.password}
     return {"message": "Signup successful", "user": user}
 
-@app.post("/auth/login")
+@misc.post("/auth/login")
 async def login(user: UserLogin):
     if user.email in users and users[user.email]["password"] == user.password:
         return {"message": "Login successful", "name": users[user.email]["name"]}
     return JSONResponse(status_code=400, content={"error": "Invalid credentials"})
 
-@app.post("/user/profile")
+@misc.post("/user/profile")
 async def save_profile(profile: UserProfile):
     users[profile.email].update(profile.dict())
     return {"message": "Profile saved", "profile": profile}
 
-
-
-
-
-
-
-
-from fastapi.responses import FileResponse
-import os
-from fastapi.staticfiles import StaticFiles
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-FRONTEND_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "frontend"))  # two levels up
-
-@app.get("/")
+@misc.get("/")
 async def serve_frontend():
     return FileResponse(os.path.join(FRONTEND_DIR, "index.html"))
 
-# Serve static files (like logo.jpg, css, js if you add them later)
-app.mount("/static", StaticFiles(directory=FRONTEND_DIR), name="static")
 
+# --------------------------
+# App factory
+# --------------------------
+def create_app() -> FastAPI:
+    """Build the API. Nothing here connects to the database or imports the LLM SDK."""
+    app = FastAPI(title='AspireNextGen API', lifespan=lifespan)
+
+    # --------------------------
+    # Include Routers
+    # --------------------------
+    app.include_router(domains.router)
+    app.include_router(skills.router)
+    app.include_router(job_roles.router)
+    app.include_router(job_role_skills.router)
+    app.include_router(branch.router)
+    app.include_router(tests.router)
+    app.include_router(recommendations.router)
+    app.include_router(catalog.router)
+    app.include_router(export.router)
+    app.include_router(ops)
+    app.include_router(misc)
+
+    # --------------------------
+    # CORS
+    # --------------------------
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # in production, restrict to frontend domain
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["ETag", "X-Next-Cursor", "X-Total-Count", "Server-Timing"],
+    )
+    # Added last so it wraps everything: route latency histograms + Server-Timing header
+    app.add_middleware(MetricsMiddleware)
+
+    # Serve static files (like logo.jpg, css, js if you add them later), if the frontend is deployed alongside
+    if os.path.isdir(FRONTEND_DIR):
+        app.mount("/static", StaticFiles(directory=FRONTEND_DIR), name="static")
+    return app
+
+
+# `uvicorn app.main:app`, or `uvicorn --factory app.main:create_app`
+app = create_app()
@@ -0,0 +1,228 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .database import pool_status
+from .query_accounting import finish_request, start_request
+from .summary_cache import summary_cache
+
+# Latency buckets in seconds: sub-millisecond stages up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+# --------------------------
+# Metric types
+# --------------------------
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = ['%s="%s"' % (n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+             for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Prometheus histogram with fixed buckets; observe() is a bisect and a few adds under a lock."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="%s"' % ("+Inf" if bound == float("inf") else repr(float(bound)))
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        lines.extend(f"{self.name}{_label_str(self.labelnames, labels)} {value}" for labels, value in values)
+        return lines
+
+
+class CallbackGauges:
+    """Gauges (or counters) read from a callback when /metrics is scraped."""
+
+    def __init__(self, specs: Sequence[Tuple[str, str, str, str]], collect: Callable[[], dict]):
+        self.specs = specs  # (metric name, type, help, key in the collected dict)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        values = self.collect()
+        lines = []
+        for name, kind, help_text, key in self.specs:
+            if key in values:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {float(values[key])}"]
+        return lines
+
+
+# --------------------------
+# Application metrics
+# --------------------------
+REQUEST_LATENCY = Histogram(
+    "aspire_http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "route", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "aspire_http_request_db_queries", "SQL statements per HTTP request by route template.", ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+REQUEST_DB_TIME = Histogram(
+    "aspire_http_request_db_seconds", "Time spent in SQL statements per HTTP request.", ("route",),
+)
+STAGE_LATENCY = Histogram(
+    "aspire_stage_duration_seconds", "Latency of recommendation pipeline stages.", ("stage",),
+)
+LLM_LATENCY = Histogram(
+    "aspire_llm_duration_seconds", "Latency of Gemini calls (cache hits excluded).", ("mode",),
+)
+LLM_FAILURES = Counter(
+    "aspire_llm_failures_total", "Failed or timed out Gemini calls.", ("mode", "reason"),
+)
+DB_POOL = CallbackGauges(
+    [
+        ("aspire_db_pool_size", "gauge", "Configured pool size.", "size"),
+        ("aspire_db_pool_checked_out", "gauge", "Connections currently checked out.", "checked_out"),
+        ("aspire_db_pool_overflow", "gauge", "Overflow connections currently open.", "overflow"),
+        ("aspire_db_pool_saturation", "gauge", "Checked out / (size + max_overflow).", "saturation"),
+        ("aspire_db_pool_checkouts_total", "counter", "Successful pool checkouts.", "checkouts"),
+        ("aspire_db_pool_timeouts_total", "counter", "Pool checkouts that timed out.", "timeouts"),
+        ("aspire_db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection.", "wait_seconds_total"),
+    ],
+    pool_status,
+)
+SUMMARY_CACHE = CallbackGauges(
+    [
+        ("aspire_summary_cache_hits_total", "counter", "In-memory summary cache hits.", "hits"),
+        ("aspire_summary_cache_disk_hits_total", "counter", "Summary cache hits served from disk.", "disk_hits"),
+        ("aspire_summary_cache_misses_total", "counter", "Summary cache misses.", "misses"),
+        ("aspire_summary_cache_size", "gauge", "Summaries held in memory.", "size"),
+    ],
+    summary_cache.stats,
+)
+
+REGISTRY = [REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME, STAGE_LATENCY, LLM_LATENCY, LLM_FAILURES, DB_POOL, SUMMARY_CACHE]
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --------------------------
+# Per-request stage timings
+# --------------------------
+# (stage, seconds) pairs for the current request; the list is shared with
+# threadpool work because run_in_threadpool copies the context.
+_timings: ContextVar[Optional[list]] = ContextVar("timings", default=None)
+
+
+def record_stage(name: str, seconds: float):
+    STAGE_LATENCY.observe(seconds, name)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as pipeline stage `name` (histogram + Server-Timing)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def _server_timing(timings: list, queries, total: float) -> bytes:
+    merged: Dict[str, float] = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in merged.items()]
+    parts.append(f'db;dur={queries.seconds * 1000:.2f};desc="{queries.count} queries"')
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: records request latency and SQL statement counts per
+    route template and adds a Server-Timing header with the stages (and DB time)
+    completed before the response started.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings: list = []
+        token = _timings.set(timings)
+        queries, queries_token = start_request(scope)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(timings, queries, time.perf_counter() - start)))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+            finish_request(queries_token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_LATENCY.observe(time.perf_counter() - start, scope.get("method", ""), route, str(status["code"]))
+            REQUEST_QUERIES.observe(queries.count, route)
+            REQUEST_DB_TIME.observe(queries.seconds, route)
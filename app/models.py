@@ -68,3 +68,14 @@ class JobRoleSkill(Base):
 
     job_role = relationship("JobRole", back_populates="skill_links")
     skill = relationship("Skill", back_populates="job_role_links")
+
+
+# --------------------------
+# CatalogVersion Model
+# --------------------------
+class CatalogVersion(Base):
+    """Per-table change counter shared by every worker (see catalog.mark_changed)."""
+    __tablename__ = "catalog_versions"
+
+    table_name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,41 @@
+import base64
+import json
+from typing import List, Optional, Sequence
+
+from fastapi import HTTPException, Response
+
+
+# --------------------------
+# Opaque keyset cursors
+# --------------------------
+def encode_cursor(key: Sequence[int]) -> str:
+    """Encode the primary key of the last row on a page as an opaque token."""
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], width: int) -> Optional[List[int]]:
+    """Decode a cursor token into `width` key values; raises HTTP 400 if malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+        # Integer keys only (not bools), within the 64-bit range every backend can compare
+        if not isinstance(key, list) or len(key) != width or not all(
+            isinstance(k, int) and not isinstance(k, bool) and -2**63 <= k < 2**63 for k in key
+        ):
+            raise ValueError
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+def set_page_headers(response: Response, rows: list, limit: int, key_attrs: Sequence[str],
+                     total: Optional[int] = None):
+    """Expose X-Next-Cursor (when the page is full) and X-Total-Count (when counted)."""
+    if rows and len(rows) >= limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor([getattr(last, a) for a in key_attrs])
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
@@ -0,0 +1,106 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Statements slower than this are printed with their parameters and route
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# What happens when a route runs more statements than its @query_budget:
+# "off" ignores it, "log" prints it (default), "raise" fails the request (dev/test/CI)
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log").strip().lower()
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+# --------------------------
+# Per-request accounting
+# --------------------------
+class RequestQueries:
+    """Statements and DB time for one HTTP request; `scope` gives the matched route."""
+
+    __slots__ = ("scope", "count", "seconds", "reported")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.count = 0
+        self.seconds = 0.0
+        self.reported = False
+
+    @property
+    def route(self) -> str:
+        return getattr(self.scope.get("route"), "path", None) or self.scope.get("path", "")
+
+    @property
+    def budget(self) -> Optional[int]:
+        return getattr(getattr(self.scope.get("route"), "endpoint", None), "query_budget", None)
+
+
+# Shared with threadpool work, since run_in_threadpool copies the context.
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+def start_request(scope: dict):
+    """Begin accounting for a request; returns (stats, token for finish_request)."""
+    stats = RequestQueries(scope)
+    return stats, _current.set(stats)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def query_budget(max_queries: int) -> Callable:
+    """
+    Declare how many SQL statements an endpoint may run per request:
+
+        @router.get("/")
+        @query_budget(2)
+        def read_things(...): ...
+    """
+    def decorate(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorate
+
+
+def _short(value, limit: int = 500) -> str:
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+# --------------------------
+# Engine hooks (every engine, so test databases are covered too)
+# --------------------------
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.count += 1
+    budget = stats.budget
+    if budget is not None and stats.count > budget and QUERY_BUDGET_MODE != "off" and not stats.reported:
+        stats.reported = True
+        message = f"{stats.route} ran more than its budget of {budget} queries"
+        if QUERY_BUDGET_MODE == "raise":
+            raise QueryBudgetExceeded(message + f"; statement {stats.count}: {statement[:200]}")
+        print(f"=== QUERY BUDGET: {message} ===", statement[:200])
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = _current.get()
+    if stats is not None:
+        stats.seconds += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        route = stats.route if stats is not None else "-"
+        print(f"=== SLOW QUERY: {elapsed * 1000:.1f} ms route={route} ===", statement, _short(parameters))
@@ -0,0 +1,336 @@
+import json
+import os
+import random
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# JSONL (one question per line, with a "category" field) or JSON ({category: [questions]} or a list)
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", os.path.join(BASE_DIR, "data", "question_bank.jsonl"))
+# How often (at most) the file is stat()ed for changes; a changed file is reloaded in the background
+QUESTION_BANK_CHECK_SECONDS = float(os.getenv("QUESTION_BANK_CHECK_SECONDS", "5"))
+# Questions without a difficulty land in this stratum
+QUESTION_DEFAULT_DIFFICULTY = os.getenv("QUESTION_DEFAULT_DIFFICULTY", "medium")
+# Per-user history used to avoid repeating questions
+QUESTION_HISTORY_PER_USER = int(os.getenv("QUESTION_HISTORY_PER_USER", "500"))
+QUESTION_HISTORY_USERS = int(os.getenv("QUESTION_HISTORY_USERS", "10000"))
+
+# Known difficulties sort first, in this order; any others follow alphabetically
+DIFFICULTY_ORDER = ("easy", "medium", "hard")
+
+
+def _difficulty_key(difficulty: str):
+    if difficulty in DIFFICULTY_ORDER:
+        return (0, DIFFICULTY_ORDER.index(difficulty), "")
+    return (1, 0, difficulty)
+
+
+# --------------------------
+# Loading
+# --------------------------
+def _iter_file(path: str) -> Iterable[Tuple[int, Any]]:
+    """(line number or position, record) pairs; unparseable JSONL lines come back as None."""
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError:
+                    yield line_no, None
+        return
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        position = 0
+        for category, questions in data.items():
+            for q in questions:
+                position += 1
+                yield position, {"category": category, **q} if isinstance(q, dict) else None
+    else:
+        yield from enumerate(data, 1)
+
+
+def _validate(record: Any) -> Optional[str]:
+    """Reason the record can't be served, or None."""
+    if not isinstance(record, dict):
+        return "not a JSON object"
+    if not isinstance(record.get("category"), str) or not record["category"]:
+        return "missing category"
+    if not isinstance(record.get("id"), int):
+        return "missing integer id"
+    if not isinstance(record.get("question"), str):
+        return "missing question text"
+    if "answer" not in record and "expected_keywords" not in record and "test_cases" not in record:
+        return "no answer, expected_keywords or test_cases"
+    return None
+
+
+class _Snapshot:
+    """
+    Immutable view of one version of the bank. Each question is kept as its
+    compact JSON encoding and decoded only when served; the difficulty index
+    holds plain id arrays, so sampling never touches the question bodies.
+    """
+
+    __slots__ = ("version", "loaded_at", "questions", "strata", "skipped")
+
+    def __init__(self, version, records: Iterable[Tuple[int, Any]]):
+        self.version = version
+        self.loaded_at = time.time()
+        self.questions: Dict[str, Dict[int, bytes]] = {}
+        strata: Dict[str, Dict[str, List[int]]] = {}
+        self.skipped = 0
+
+        for position, record in records:
+            problem = _validate(record)
+            if problem is None and record["id"] in self.questions.get(record["category"], ()):
+                problem = f"duplicate id {record['id']} in {record['category']}"
+            if problem is not None:
+                self.skipped += 1
+                print(f"=== ERROR: question bank record {position} skipped ===", problem)
+                continue
+            category = record.pop("category")
+            record.setdefault("difficulty", QUESTION_DEFAULT_DIFFICULTY)
+            self.questions.setdefault(category, {})[record["id"]] = json.dumps(
+                record, ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+            strata.setdefault(category, {}).setdefault(record["difficulty"], []).append(record["id"])
+
+        self.strata: Dict[str, Dict[str, array]] = {
+            category: {d: array("q", ids) for d, ids in sorted(by_difficulty.items(), key=lambda i: _difficulty_key(i[0]))}
+            for category, by_difficulty in strata.items()
+        }
+
+
+def _file_version(path: str):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+# --------------------------
+# Sampling
+# --------------------------
+def _allocate(sizes: Dict[str, int], k: int) -> Dict[str, int]:
+    """Spread k questions evenly over the strata (random order for the remainder), capped by stratum size."""
+    allocation = {d: 0 for d in sizes}
+    live = [d for d, n in sizes.items() if n > 0]
+    random.shuffle(live)
+    while k > 0 and live:
+        for d in list(live):
+            if k == 0:
+                break
+            allocation[d] += 1
+            k -= 1
+            if allocation[d] >= sizes[d]:
+                live.remove(d)
+    return allocation
+
+
+def _sample(ids: array, k: int, seen) -> List[int]:
+    """
+    k distinct ids from `ids`, preferring ones not in `seen`. Random probing
+    keeps this O(k) however big the stratum is; only a user who has seen most
+    of the stratum falls back to a scan, and then repeats fill any shortfall.
+    """
+    n = len(ids)
+    if k <= 0 or n == 0:
+        return []
+    picked: List[int] = []
+    probed = set()
+    for _ in range(4 * k + 16):
+        if len(picked) == k or len(probed) == n:
+            break
+        i = random.randrange(n)
+        if i in probed:
+            continue
+        probed.add(i)
+        if ids[i] not in seen:
+            picked.append(ids[i])
+    if len(picked) < k:
+        taken = set(picked)
+        unseen = [q for q in ids if q not in taken and q not in seen]
+        picked += random.sample(unseen, min(k - len(picked), len(unseen)))
+    if len(picked) < k:
+        taken = set(picked)
+        repeats = [q for q in ids if q not in taken]
+        picked += random.sample(repeats, min(k - len(picked), len(repeats)))
+    return picked
+
+
+# --------------------------
+# Question bank
+# --------------------------
+class QuestionBank:
+    """
+    Questions indexed by category and difficulty, loaded from QUESTION_BANK_PATH
+    on first use. Edits to the file are picked up without a restart: readers keep
+    the current snapshot while a background thread builds the next one, which is
+    then swapped in whole. Replace the file atomically (write + rename) so a
+    half-written file is never read; a file that fails to load is ignored.
+    """
+
+    def __init__(self, path: str, check_seconds: float = 5):
+        self.path = path
+        self.check_seconds = check_seconds
+        self._snapshot: Optional[_Snapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._rejected_version = None
+
+    def _load(self) -> _Snapshot:
+        version = _file_version(self.path)
+        snapshot = _Snapshot(version, _iter_file(self.path))
+        print(f"Question bank loaded: {sum(len(q) for q in snapshot.questions.values())} questions "
+              f"from {self.path} ({snapshot.skipped} skipped)")
+        return snapshot
+
+    def _background_reload(self, version):
+        try:
+            snapshot = self._load()
+            if not snapshot.questions:
+                raise ValueError(f"no valid questions in {self.path}")
+            self._snapshot = snapshot
+        except Exception as e:
+            # Not retried until the file changes again
+            self._rejected_version = version
+            print("=== ERROR: question bank reload failed, keeping the previous version ===", str(e))
+        finally:
+            self._reloading = False
+
+    def _current(self) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    try:
+                        self._snapshot = self._load()
+                    except Exception as e:
+                        print("=== ERROR: question bank could not be loaded ===", str(e))
+                        self._snapshot = _Snapshot(None, ())
+                    self._checked_at = time.monotonic()
+                return self._snapshot
+
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_seconds:
+            with self._lock:
+                if now - self._checked_at >= self.check_seconds and not self._reloading:
+                    self._checked_at = now
+                    try:
+                        version = _file_version(self.path)
+                    except OSError:
+                        version = snapshot.version  # file briefly missing mid-replace: keep serving what we have
+                    if version not in (snapshot.version, self._rejected_version):
+                        self._reloading = True
+                        threading.Thread(
+                            target=self._background_reload, args=(version,), name="question-bank-reload", daemon=True
+                        ).start()
+        return snapshot
+
+    def reload(self):
+        """Reload now, in the calling thread."""
+        with self._lock:
+            self._snapshot = self._load()
+            self._checked_at = time.monotonic()
+
+    def categories(self) -> List[str]:
+        return list(self._current().questions)
+
+    def difficulties(self, category: Optional[str] = None) -> List[str]:
+        strata = self._current().strata
+        found = set()
+        for cat in [category] if category else strata:
+            found.update(strata.get(cat, {}))
+        return sorted(found, key=_difficulty_key)
+
+    def get(self, category: str, question_id: int) -> Optional[Dict[str, Any]]:
+        """The full question (answer included), or None if it is no longer in the bank."""
+        blob = self._current().questions.get(category, {}).get(question_id)
+        return json.loads(blob) if blob is not None else None
+
+    def allocation(self, category: str, k: int, difficulty=None) -> Dict[str, int]:
+        """
+        Questions to draw per difficulty: None spreads k evenly over the
+        category's difficulties, a string restricts to one, and a
+        {difficulty: count} dict asks for exact counts (k is then ignored).
+        Counts are capped by what the bank holds.
+        """
+        strata = self._current().strata.get(category, {})
+        if isinstance(difficulty, dict):
+            return {d: min(n, len(strata.get(d, ()))) for d, n in difficulty.items()}
+        if difficulty is not None:
+            return {difficulty: min(k, len(strata.get(difficulty, ())))}
+        return _allocate({d: len(ids) for d, ids in strata.items()}, k)
+
+    def sample_stratum(self, category: str, difficulty: str, k: int, seen=()) -> List[Dict[str, Any]]:
+        """Up to k full questions of one difficulty, avoiding ids in `seen` while unseen ones remain."""
+        snapshot = self._current()
+        ids = snapshot.strata.get(category, {}).get(difficulty)
+        if ids is None:
+            return []
+        questions = snapshot.questions[category]
+        return [json.loads(questions[q_id]) for q_id in _sample(ids, k, seen)]
+
+    def sample(self, category: str, k: int, difficulty=None, seen=()) -> List[Dict[str, Any]]:
+        """Up to k full questions from `category`, stratified by difficulty (see allocation())."""
+        picked = []
+        for d, n in self.allocation(category, k, difficulty).items():
+            picked += self.sample_stratum(category, d, n, seen)
+        random.shuffle(picked)
+        return picked
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._current()
+        return {
+            "path": self.path,
+            "loaded_at": snapshot.loaded_at,
+            "skipped": snapshot.skipped,
+            "categories": {
+                cat: {d: len(ids) for d, ids in strata.items()} for cat, strata in snapshot.strata.items()
+            },
+        }
+
+
+# --------------------------
+# Per-user question history
+# --------------------------
+class SeenQuestions:
+    """
+    The last `per_user` question ids served to each user in each category, for
+    the most recent `max_users` users. In memory only; a restart forgets history.
+    """
+
+    def __init__(self, per_user: int = 500, max_users: int = 10000):
+        self.per_user = per_user
+        self.max_users = max_users
+        self._users: "OrderedDict[str, Dict[str, OrderedDict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ids(self, user_id: str, category: str):
+        """Read-only view of the ids `user_id` has seen in `category` (supports `in`)."""
+        with self._lock:
+            return self._users.get(user_id, {}).get(category, {}).keys()
+
+    def add(self, user_id: str, category: str, question_ids: Iterable[int]):
+        with self._lock:
+            by_category = self._users.pop(user_id, None) or {}
+            self._users[user_id] = by_category
+            history = by_category.setdefault(category, OrderedDict())
+            for q_id in question_ids:
+                history.pop(q_id, None)
+                history[q_id] = None
+            while len(history) > self.per_user:
+                history.popitem(last=False)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+
+question_bank = QuestionBank(QUESTION_BANK_PATH, check_seconds=QUESTION_BANK_CHECK_SECONDS)
+seen_questions = SeenQuestions(per_user=QUESTION_HISTORY_PER_USER, max_users=QUESTION_HISTORY_USERS)
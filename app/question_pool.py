@@ -0,0 +1,430 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .code_grader import GRADER_MAX_SOURCE_BYTES, grade_many
+from .env import env_bool
+from .metrics import LLM_FAILURES, LLM_LATENCY
+from .question_bank import question_bank
+from .summarizer import LLM_TIMEOUT_SECONDS, MODEL_NAME, _genai
+
+# Off by default: when on, a background thread spends Gemini quota to keep the pool filled
+QUESTION_POOL_ENABLED = env_bool("QUESTION_POOL_ENABLED", False)
+# SQLite file shared by every worker on the host; survives restarts
+QUESTION_POOL_PATH = os.getenv("QUESTION_POOL_PATH", "question_pool.db")
+# Unserved questions per (category, difficulty): refill below LOW_WATER, up to TARGET
+QUESTION_POOL_LOW_WATER = int(os.getenv("QUESTION_POOL_LOW_WATER", "20"))
+QUESTION_POOL_TARGET = int(os.getenv("QUESTION_POOL_TARGET", "50"))
+# Questions asked for per Gemini call
+QUESTION_POOL_BATCH = int(os.getenv("QUESTION_POOL_BATCH", "10"))
+# Questions each worker claims into memory per bucket, so tests are served without touching SQLite
+QUESTION_POOL_BUFFER = int(os.getenv("QUESTION_POOL_BUFFER", "10"))
+# Fraction of each test drawn from the pool (the rest, and any shortfall, come from the bank)
+QUESTION_POOL_SHARE = float(os.getenv("QUESTION_POOL_SHARE", "1.0"))
+QUESTION_POOL_CHECK_SECONDS = float(os.getenv("QUESTION_POOL_CHECK_SECONDS", "5"))
+# Claimed but never served (worker crashed): back in the pool after this long
+QUESTION_POOL_CLAIM_TTL_SECONDS = float(os.getenv("QUESTION_POOL_CLAIM_TTL_SECONDS", "3600"))
+
+POOL_ID_PREFIX = "ai-"
+# Longest wait before retrying a bucket whose generation keeps failing
+_MAX_BACKOFF_SECONDS = 600
+# How long stop() waits for the background threads, all together
+_STOP_TIMEOUT_SECONDS = 5
+_SIGNATURE = re.compile(r"^[A-Za-z_]\w*\(")
+
+
+def is_pool_id(question_id) -> bool:
+    return isinstance(question_id, str) and question_id.startswith(POOL_ID_PREFIX)
+
+
+# --------------------------
+# Prompt + validation
+# --------------------------
+def _is_coding(examples: List[Dict[str, Any]]) -> bool:
+    # Buckets take their format from the bank: coding questions are the ones with test cases
+    return any("test_cases" in q for q in examples)
+
+
+def build_question_prompt(category: str, difficulty: str, count: int, examples: List[Dict[str, Any]]) -> str:
+    """Gemini prompt for `count` new questions in the style of the bank's `examples`."""
+    coding = _is_coding(examples)
+    shown = [
+        {k: v for k, v in q.items() if k in ("question", "options", "answer", "signature", "test_cases")}
+        for q in examples
+    ]
+    if coding:
+        shape = (
+            '{"question": str, "signature": "function_name(arg: type, ...) -> type", '
+            '"test_cases": [{"args": [...], "expected": ...}, ...], "reference_solution": str}\n'
+            "Give 4 to 6 test cases per exercise, including edge cases. Arguments and expected values "
+            "must be plain JSON values. reference_solution is a complete Python function named as in the "
+            "signature that passes every test case, using only the standard library."
+        )
+        task = f"Write {count} new Python coding exercises"
+    else:
+        shape = (
+            '{"question": str, "options": [4 distinct options], "answer": <exactly one of the options>}\n'
+            "Every question must have exactly one correct option."
+        )
+        task = f"Write {count} new multiple-choice questions"
+
+    return f"""
+You are writing questions for an aptitude test taken by students and early-career professionals.
+{task} for the category "{category.replace("_", " ")}" at {difficulty} difficulty.
+Match the style and level of these examples, but do not copy or rephrase them:
+{json.dumps(shown, ensure_ascii=False)}
+
+Return ONLY a JSON array with one object per question, each shaped like:
+{shape}
+Do not number the questions or add any text outside the JSON.
+""".strip()
+
+
+def _plain_value(value) -> bool:
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def validate_generated(item: Any, difficulty: str, coding: bool) -> Optional[Dict[str, Any]]:
+    """The question to store, or None if `item` is malformed or ambiguous."""
+    if not isinstance(item, dict):
+        return None
+    text = item.get("question")
+    if not isinstance(text, str) or not 10 <= len(text.strip()) <= 1000:
+        return None
+
+    if coding:
+        signature, cases, solution = item.get("signature"), item.get("test_cases"), item.get("reference_solution")
+        if not isinstance(signature, str) or not _SIGNATURE.match(signature.strip()):
+            return None
+        if not isinstance(cases, list) or not 3 <= len(cases) <= 12:
+            return None
+        if not all(isinstance(c, dict) and isinstance(c.get("args"), list) and "expected" in c for c in cases):
+            return None
+        if not isinstance(solution, str) or len(solution.encode("utf-8")) > GRADER_MAX_SOURCE_BYTES:
+            return None
+        return {
+            "question": text.strip(),
+            "difficulty": difficulty,
+            "signature": signature.strip(),
+            "test_cases": [{"args": c["args"], "expected": c["expected"]} for c in cases],
+            "expected_keywords": [],
+            "reference_solution": solution,
+        }
+
+    options, answer = item.get("options"), item.get("answer")
+    if not isinstance(options, list) or not 2 <= len(options) <= 6 or not all(_plain_value(o) for o in options):
+        return None
+    if len({json.dumps(o) for o in options}) != len(options) or answer not in options:
+        return None
+    return {"question": text.strip(), "difficulty": difficulty, "options": options, "answer": answer}
+
+
+def _fingerprint(category: str, text: str) -> str:
+    normalized = " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+    return hashlib.sha256(f"{category}|{normalized}".encode("utf-8")).hexdigest()
+
+
+# --------------------------
+# Question pool
+# --------------------------
+class QuestionPool:
+    """
+    Gemini-generated questions per (category, difficulty), persisted in SQLite.
+
+    One worker at a time (holding a lease row) tops up buckets that fall below
+    `low_water`. Every worker claims a few questions per bucket into memory, so
+    take() is a deque pop; consumption is written back by the same background
+    thread that refills the buffers. Buckets are the bank's categories and
+    difficulties, and each bucket copies its question format from the bank.
+    """
+
+    def __init__(self, path: str, low_water: int = 20, target: int = 50, batch: int = 10,
+                 buffer_size: int = 10, check_seconds: float = 5, claim_ttl_seconds: float = 3600):
+        self.path = path
+        self.low_water = low_water
+        self.target = max(target, low_water)
+        self.batch = batch
+        self.buffer_size = buffer_size
+        self.check_seconds = check_seconds
+        self.claim_ttl_seconds = claim_ttl_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._buffers: Dict[Tuple[str, str], Deque[Tuple[int, Dict[str, Any]]]] = {}
+        self._consumed: List[Tuple[float, str, int]] = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._backoff: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        self.generated = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    # -- storage --
+    def _connect(self):
+        self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pool_questions ("
+            "pool_id INTEGER PRIMARY KEY AUTOINCREMENT, category TEXT NOT NULL, difficulty TEXT NOT NULL, "
+            "body TEXT NOT NULL, fingerprint TEXT NOT NULL UNIQUE, created_at REAL NOT NULL, "
+            "claimed_by TEXT, claimed_at REAL, consumed_by TEXT, consumed_at REAL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS pool_questions_available "
+            "ON pool_questions (category, difficulty, consumed_at, claimed_at)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pool_lease (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _execute(self, sql: str, params=()) -> List[tuple]:
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _buckets(self) -> List[Tuple[str, str]]:
+        return [(cat, d) for cat in question_bank.categories() for d in question_bank.difficulties(cat)]
+
+    # -- serving --
+    def take(self, category: str, difficulty: str, n: int, user_id: str) -> List[Dict[str, Any]]:
+        """Up to n pooled questions (answers included), from memory; marked consumed by `user_id`."""
+        if n <= 0 or not self._threads:
+            return []
+        if QUESTION_POOL_SHARE < 1:
+            n = int(n * QUESTION_POOL_SHARE + random.random())
+        taken = []
+        now = time.time()
+        with self._lock:
+            buffer = self._buffers.get((category, difficulty))
+            while buffer and len(taken) < n:
+                pool_id, question = buffer.popleft()
+                self._consumed.append((now, user_id, pool_id))
+                taken.append(question)
+            if buffer is None or len(buffer) <= self.buffer_size // 2:
+                self._wake.set()
+        return taken
+
+    def _flush_consumed(self):
+        with self._lock:
+            consumed, self._consumed = self._consumed, []
+        if consumed:
+            with self._db_lock:
+                self._db.executemany(
+                    "UPDATE pool_questions SET consumed_at = ?, consumed_by = ? WHERE pool_id = ?", consumed
+                )
+
+    def _refill_buffers(self):
+        now = time.time()
+        for key in self._buckets():
+            with self._lock:
+                missing = self.buffer_size - len(self._buffers.setdefault(key, deque()))
+            if missing <= 0:
+                continue
+            rows = self._execute(
+                "UPDATE pool_questions SET claimed_by = ?, claimed_at = ? WHERE pool_id IN ("
+                "SELECT pool_id FROM pool_questions WHERE category = ? AND difficulty = ? AND consumed_at IS NULL "
+                "AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY pool_id LIMIT ?) RETURNING pool_id, body",
+                (self.owner, now, key[0], key[1], now - self.claim_ttl_seconds, missing),
+            )
+            questions = []
+            for pool_id, body in sorted(rows):
+                question = json.loads(body)
+                question["id"] = f"{POOL_ID_PREFIX}{pool_id}"
+                questions.append((pool_id, question))
+            with self._lock:
+                self._buffers[key].extend(questions)
+
+    def _buffer_loop(self):
+        while not self._stop.is_set():
+            try:
+                self._flush_consumed()
+                self._refill_buffers()
+            except Exception as e:
+                print("=== ERROR: question pool buffer refill failed ===", str(e))
+            self._wake.wait(self.check_seconds)
+            self._wake.clear()
+
+    # -- producing --
+    def _hold_lease(self) -> bool:
+        """Take or renew the producer lease; only one worker generates at a time."""
+        now = time.time()
+        expires_at = now + max(self.check_seconds * 3, LLM_TIMEOUT_SECONDS * 4)
+        with self._db_lock:
+            if self._stop.is_set():
+                return False
+            cursor = self._db.execute(
+                "INSERT INTO pool_lease (name, owner, expires_at) VALUES ('producer', ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE pool_lease.owner = excluded.owner OR pool_lease.expires_at < ?",
+                (self.owner, expires_at, now),
+            )
+            return cursor.rowcount == 1
+
+    def _available(self) -> Dict[Tuple[str, str], int]:
+        rows = self._execute(
+            "SELECT category, difficulty, COUNT(*) FROM pool_questions WHERE consumed_at IS NULL GROUP BY category, difficulty"
+        )
+        return {(cat, d): n for cat, d, n in rows}
+
+    def _call_llm(self, prompt: str) -> str:
+        start = time.perf_counter()
+        try:
+            model = _genai().GenerativeModel(MODEL_NAME)
+            response = model.generate_content(
+                prompt,
+                generation_config={"response_mime_type": "application/json", "temperature": 1.0},
+                request_options={"timeout": LLM_TIMEOUT_SECONDS},
+            )
+            return response.text
+        except Exception as e:
+            LLM_FAILURES.inc("pool", type(e).__name__)
+            raise
+        finally:
+            LLM_LATENCY.observe(time.perf_counter() - start, "pool")
+
+    def generate(self, category: str, difficulty: str, count: int) -> int:
+        """Ask Gemini for `count` questions, keep the valid ones and return how many were stored."""
+        examples = question_bank.sample_stratum(category, difficulty, 2)
+        coding = _is_coding(examples)
+        data = json.loads(self._call_llm(build_question_prompt(category, difficulty, count, examples)))
+        if isinstance(data, dict):
+            data = data.get("questions", [])
+        items = data if isinstance(data, list) else []
+        questions = [q for q in (validate_generated(item, difficulty, coding) for item in items[:count]) if q]
+
+        if coding and questions:
+            # Keep an exercise only if its own reference solution passes its test cases in the sandbox
+            results = asyncio.run(grade_many([(q["reference_solution"], q) for q in questions]))
+            questions = [q for q, r in zip(questions, results) if r["status"] == "ok" and r["passed"] == r["total"]]
+        for q in questions:
+            q.pop("reference_solution", None)
+
+        now = time.time()
+        with self._db_lock:
+            if self._stop.is_set():
+                return 0  # stop() outran the Gemini call and has already handed the pool back
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO pool_questions (category, difficulty, body, fingerprint, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (category, difficulty, json.dumps(q, ensure_ascii=False, separators=(",", ":")),
+                     _fingerprint(category, q["question"]), now)
+                    for q in questions
+                ],
+            )
+            stored = self._db.total_changes - before
+        self.generated += stored
+        self.rejected += len(items) - stored
+        return stored
+
+    def _produce_once(self):
+        available = self._available()
+        now = time.monotonic()
+        for key in self._buckets():
+            if self._stop.is_set():
+                return
+            have = available.get(key, 0)
+            failures, retry_at = self._backoff.get(key, (0, 0.0))
+            if have >= self.low_water or now < retry_at:
+                continue
+            try:
+                stored = self.generate(key[0], key[1], min(self.batch, self.target - have))
+                if stored == 0:
+                    raise ValueError("no valid questions in the response")
+                self._backoff.pop(key, None)
+            except Exception as e:
+                self.last_error = f"{key[0]}/{key[1]}: {type(e).__name__}: {e}"
+                print("=== ERROR: question pool generation failed ===", self.last_error)
+                delay = min(_MAX_BACKOFF_SECONDS, self.check_seconds * 2 ** (failures + 1))
+                self._backoff[key] = (failures + 1, time.monotonic() + delay)
+
+    def _producer_loop(self):
+        while not self._stop.is_set():
+            try:
+                if self._hold_lease():
+                    self._produce_once()
+                    self._wake.set()  # let the buffers pick up what was just generated
+            except Exception as e:
+                print("=== ERROR: question pool producer failed ===", str(e))
+            self._stop.wait(self.check_seconds)
+
+    # -- lifecycle --
+    def start(self):
+        """Open the pool and start the buffer and producer threads (idempotent)."""
+        if self._threads:
+            return
+        self._connect()
+        self._stop.clear()
+        for name, target in (("question-pool-buffer", self._buffer_loop), ("question-pool-producer", self._producer_loop)):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        Stop the threads, record consumption and hand unserved claims back to the
+        pool. An in-flight Gemini call is abandoned, not awaited: a producer still
+        waiting on one after the timeout writes nothing once it returns.
+        """
+        if not self._threads:
+            return
+        self._stop.set()
+        self._wake.set()
+        deadline = time.monotonic() + _STOP_TIMEOUT_SECONDS
+        for thread in self._threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        running = [thread.name for thread in self._threads if thread.is_alive()]
+        if running:
+            print("=== WARNING: question pool threads still running after shutdown ===", ", ".join(running))
+        self._threads = []
+        try:
+            self._flush_consumed()
+            with self._lock:
+                unserved = [(pool_id,) for buffer in self._buffers.values() for pool_id, _ in buffer]
+                self._buffers.clear()
+            with self._db_lock:
+                self._db.executemany(
+                    "UPDATE pool_questions SET claimed_by = NULL, claimed_at = NULL WHERE pool_id = ?", unserved
+                )
+                self._db.execute("DELETE FROM pool_lease WHERE name = 'producer' AND owner = ?", (self.owner,))
+        except sqlite3.Error as e:
+            print("=== ERROR: question pool shutdown failed ===", str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        if not self._threads:
+            return {"enabled": False}
+        with self._lock:
+            buffered = {f"{cat}/{d}": len(buffer) for (cat, d), buffer in self._buffers.items()}
+        return {
+            "enabled": True,
+            "available": {f"{cat}/{d}": n for (cat, d), n in self._available().items()},
+            "buffered": buffered,
+            "generated": self.generated,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+
+
+question_pool = QuestionPool(
+    QUESTION_POOL_PATH,
+    low_water=QUESTION_POOL_LOW_WATER,
+    target=QUESTION_POOL_TARGET,
+    batch=QUESTION_POOL_BATCH,
+    buffer_size=QUESTION_POOL_BUFFER,
+    check_seconds=QUESTION_POOL_CHECK_SECONDS,
+    claim_ttl_seconds=QUESTION_POOL_CLAIM_TTL_SECONDS,
+)
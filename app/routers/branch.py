@@ -1,25 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from typing import Optional
 from sqlalchemy.orm import Session
-from .. import crud, schemas, database
+from .. import crud, models, schemas
+from ..database import get_db
+from ..query_accounting import query_budget
+from ..http_cache import if_none_match, not_modified, table_etag
+from ..pagination import decode_cursor, set_page_headers
 
 router = APIRouter(prefix="/branches", tags=["branches"])
 
 
-# Dependency
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # --------------------------
 # Get all branches
 # --------------------------
 @router.get("/", response_model=list[schemas.BranchOut])
-def read_branches(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_branches(db, skip=skip, limit=limit)
+@query_budget(3)
+def read_branches(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    count: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Pass the X-Next-Cursor header back as `cursor` for the next page; `count=true` adds X-Total-Count."""
+    etag = table_etag(request, db, models.Branch.__tablename__)
+    if if_none_match(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    after = decode_cursor(cursor, 1)
+    rows = crud.get_branches(db, skip=skip, limit=limit, after=after)
+    total = crud.count_branches(db) if count else None
+    set_page_headers(response, rows, limit, ("branch_id",), total)
+    return rows
 
 
 # --------------------------
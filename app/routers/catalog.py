@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.orm import Session
+
+from ..catalog import get_catalog_snapshot
+from ..database import get_db
+from ..http_cache import if_none_match
+from ..query_accounting import query_budget
+
+router = APIRouter(tags=["catalog"])
+
+
+# --------------------------
+# Skills + domains catalog
+# --------------------------
+@router.get("/catalog")
+@query_budget(3)
+def read_catalog(request: Request, db: Session = Depends(get_db)):
+    """
+    Full skills and domains lists with a content version. Clients should cache
+    it and revalidate with If-None-Match; /recommend reports the current
+    catalog_version so they know when to refetch.
+    """
+    snapshot = get_catalog_snapshot(db)
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if if_none_match(request, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
@@ -1,30 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from .. import crud, schemas, database
+from .. import crud, models, schemas
+from ..database import get_db
+from ..query_accounting import query_budget
+from ..http_cache import if_none_match, not_modified, table_etag
+from ..pagination import decode_cursor, set_page_headers
 
 router = APIRouter(prefix="/domains", tags=['domains'])
 
-# Dependency to get DB session
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
 # --------------------------
 # Get all domains
 # --------------------------
 @router.get("/", response_model=list[schemas.DomainOut])
-def read_domains(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_domains(db, skip=skip, limit=limit)
+@query_budget(3)
+def read_domains(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    branch_id: Optional[int] = None,
+    count: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Pass the X-Next-Cursor header back as `cursor` for the next page; `count=true` adds X-Total-Count."""
+    etag = table_etag(request, db, models.Domain.__tablename__)
+    if if_none_match(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    after = decode_cursor(cursor, 1)
+    rows = crud.get_domains(db, skip=skip, limit=limit, after=after, branch_id=branch_id)
+    total = crud.count_domains(db, branch_id=branch_id) if count else None
+    set_page_headers(response, rows, limit, ("domain_id",), total)
+    return rows
 
 
 # --------------------------
 # Get single domain by ID
 # --------------------------
 @router.get("/{domain_id}", response_model=schemas.DomainOut)
+@query_budget(1)
 def read_domain(domain_id: int, db: Session = Depends(get_db)):
     db_domain = db.query(crud.models.Domain).filter(crud.models.Domain.domain_id == domain_id).first()
     if not db_domain:
@@ -60,3 +79,17 @@ def delete_domain(domain_id: int, db: Session = Depends(get_db)):
     if not db_domain:
         raise HTTPException(status_code=404, detail="Domain not found")
     return db_domain
+
+
+# --------------------------
+# Bulk upsert domains
+# --------------------------
+@router.post("/bulk", response_model=list[schemas.BulkItemStatus], response_model_exclude_none=True)
+def bulk_upsert_domains(domains: list[schemas.DomainCreate], db: Session = Depends(get_db)):
+    if len(domains) > crud.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {crud.BULK_MAX_ITEMS} items per request")
+    try:
+        return crud.bulk_upsert_domains(db, domains)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Conflicting concurrent write, please retry")
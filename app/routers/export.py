@@ -0,0 +1,129 @@
+import json
+import zlib
+from typing import Iterator
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from .. import models
+from ..database import SessionLocal
+from ..query_accounting import query_budget
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_YIELD_PER = 1000
+# Bytes of NDJSON collected before a chunk is sent (or handed to the compressor)
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _job_roles_statement():
+    """One row per (role, skill), ordered so each role's rows are adjacent."""
+    return (
+        select(
+            models.JobRole.role_id,
+            models.JobRole.job_title_short,
+            models.JobRole.job_description,
+            models.Domain.domain_id,
+            models.Domain.domain,
+            models.Branch.branch_id,
+            models.Branch.branch_name,
+            models.Skill.skill_id,
+            models.Skill.skill_name,
+        )
+        .outerjoin(models.Domain, models.Domain.domain_id == models.JobRole.domain_id)
+        .outerjoin(models.Branch, models.Branch.branch_id == models.Domain.branch_id)
+        .outerjoin(models.JobRoleSkill, models.JobRoleSkill.role_id == models.JobRole.role_id)
+        .outerjoin(models.Skill, models.Skill.skill_id == models.JobRoleSkill.skill_id)
+        .order_by(models.JobRole.role_id, models.Skill.skill_id)
+        .execution_options(yield_per=EXPORT_YIELD_PER)
+    )
+
+
+def _role_line(role: dict) -> bytes:
+    return (json.dumps(role, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def iter_job_roles_ndjson() -> Iterator[bytes]:
+    """
+    Stream every job role with its domain, branch and skills as NDJSON chunks.
+    Runs a single query on a server-side cursor (yield_per implies stream_results),
+    so memory holds one batch of rows plus one role, whatever the catalog size.
+    The session is opened here because the response body outlives request dependencies.
+    """
+    db = SessionLocal()
+    try:
+        buffer = bytearray()
+        role = None
+        for role_id, title, description, domain_id, domain, branch_id, branch, skill_id, skill in db.execute(
+            _job_roles_statement()
+        ):
+            if role is None or role["role_id"] != role_id:
+                if role is not None:
+                    buffer += _role_line(role)
+                    if len(buffer) >= EXPORT_CHUNK_BYTES:
+                        yield bytes(buffer)
+                        buffer.clear()
+                role = {
+                    "role_id": role_id,
+                    "job_title_short": title,
+                    "job_description": description,
+                    "domain_id": domain_id,
+                    "domain": domain,
+                    "branch_id": branch_id,
+                    "branch": branch,
+                    "skills": [],
+                }
+            if skill_id is not None:
+                role["skills"].append({"skill_id": skill_id, "skill_name": skill})
+        if role is not None:
+            buffer += _role_line(role)
+        if buffer:
+            yield bytes(buffer)
+    except Exception as e:
+        # Headers are already sent; a truncated body is the only signal left to the client
+        print("=== ERROR: job roles export failed ===", str(e))
+        raise
+    finally:
+        db.close()
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _accepts_gzip(request: Request) -> bool:
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+# --------------------------
+# Job roles export
+# --------------------------
+@router.get("/job_roles.ndjson")
+@query_budget(1)
+def export_job_roles(request: Request, compress: bool = True):
+    """
+    Full job role catalog, one JSON object per line: role, domain, branch and
+    its skills. Gzip-compressed when the client sends Accept-Encoding: gzip
+    (pass compress=false to opt out).
+    """
+    headers = {
+        "Content-Disposition": 'attachment; filename="job_roles.ndjson"',
+        "Cache-Control": "no-store",
+        "Vary": "Accept-Encoding",
+    }
+    body = iter_job_roles_ndjson()
+    if compress and _accepts_gzip(request):
+        headers["Content-Encoding"] = "gzip"
+        body = _gzip(body)
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
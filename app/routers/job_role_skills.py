@@ -1,25 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from .. import crud, schemas, database
+from .. import crud, models, schemas
+from ..database import get_db
+from ..query_accounting import query_budget
+from ..http_cache import if_none_match, not_modified, table_etag
+from ..pagination import decode_cursor, set_page_headers
 
 router = APIRouter(prefix="/job_role_skills", tags=["job_role_skills"])
 
 
-# Dependency
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # --------------------------
 # Get all job-role-skill mappings
 # --------------------------
 @router.get("/", response_model=list[schemas.JobRoleSkillOut])
-def read_job_role_skills(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_job_role_skills(db, skip=skip, limit=limit)
+@query_budget(3)
+def read_job_role_skills(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    role_id: Optional[int] = None,
+    skill_id: Optional[int] = None,
+    count: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Pass the X-Next-Cursor header back as `cursor` for the next page; `count=true` adds X-Total-Count."""
+    etag = table_etag(request, db, models.JobRoleSkill.__tablename__)
+    if if_none_match(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    after = decode_cursor(cursor, 2)
+    rows = crud.get_job_role_skills(db, skip=skip, limit=limit, after=after, role_id=role_id, skill_id=skill_id)
+    total = crud.count_job_role_skills(db, role_id=role_id, skill_id=skill_id) if count else None
+    set_page_headers(response, rows, limit, ("role_id", "skill_id"), total)
+    return rows
 
 
 # --------------------------
@@ -39,3 +57,17 @@ def delete_mapping(mapping_id: int, db: Session = Depends(get_db)):
     if not db_mapping:
         raise HTTPException(status_code=404, detail="Mapping not found")
     return db_mapping
+
+
+# --------------------------
+# Bulk create job-role-skill mappings
+# --------------------------
+@router.post("/bulk", response_model=list[schemas.BulkItemStatus], response_model_exclude_none=True)
+def bulk_create_job_role_skills(mappings: list[schemas.JobRoleSkillCreate], db: Session = Depends(get_db)):
+    if len(mappings) > crud.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {crud.BULK_MAX_ITEMS} items per request")
+    try:
+        return crud.bulk_create_job_role_skills(db, mappings)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Conflicting concurrent write, please retry")
@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional, Dict, Any
-from rapidfuzz import fuzz
+from typing import List, Optional, Dict, Any, Literal
+import asyncio
+import json
+import os
 
 from app.database import get_db
+from app.metrics import stage
+from app.query_accounting import query_budget
 from app import models
+from app.catalog import DomainIndex, get_catalog_snapshot, get_domain_index, get_skill_index, get_role_skill_matrix
 from app.schemas import RecommendationRequest
-from app.summarizer import make_user_friendly_summary
+from app.summarizer import FALLBACK_SUMMARY, make_user_friendly_summary_async, stream_user_friendly_summary
+from app.summary_jobs import summary_jobs
 
 
 router = APIRouter()
@@ -16,52 +23,32 @@ router = APIRouter()
 # Helpers
 # ------------------------------
 
-def _skills_lookup(db: Session):
-    """Return lookup dictionaries and a list of all skills."""
-    skills = db.query(models.Skill).all()
-    id_to_name = {sk.skill_id: sk.skill_name for sk in skills}
-    name_to_id = {sk.skill_name.lower(): sk.skill_id for sk in skills}
-    all_skills = [sk.skill_name for sk in skills]
-    return id_to_name, name_to_id, all_skills
-
-
-def _domains_lookup(db: Session):
-    """Return a list of all domains."""
-    domains = db.query(models.Domain).all()
-    return [d.domain for d in domains]
-
-
-def fuzzy_match_domain(user_domain: Optional[str], all_domains: list[str], threshold: int = 75) -> Optional[str]:
+def fuzzy_match_domain(user_domain: Optional[str], domain_index: DomainIndex, threshold: int = 75) -> Optional[str]:
     """
     Match user input domain to closest domain in DB using fuzzy search.
+    Results are memoized per normalized input until the domains table changes.
     """
     # 🔧 Debug: Check if a user domain was provided
     # print(f"[DEBUG] Domain Fuzzy Match Input: {user_domain}")
 
     if not user_domain:
         return None
-    
-    user_domain_lower = user_domain.lower().strip()
-    best_match = None
-    best_score = 0
-    for domain in all_domains:
-        score = fuzz.partial_ratio(user_domain_lower, domain.lower())
-        if score > best_score and score >= threshold:
-            best_match = domain
-            best_score = score
+
+    best_match = domain_index.match(user_domain, threshold)
 
     # 🔧 Debug: Print the result of the fuzzy match
-    # print(f"[DEBUG] Matched Domain: {best_match} with score: {best_score}")
+    # print(f"[DEBUG] Matched Domain: {best_match}")
     return best_match
 
 
 def normalize_user_skills(db: Session, user_skill_names: List[str], free_text: Optional[str]):
-    """Map user-entered skills to canonical skill names/IDs using simple string matching."""
+    """Map user-entered skills to canonical skill names/IDs; free text is scanned with the skill automaton."""
     # 🔧 Debug: Show initial user inputs
     # print(f"[DEBUG] User Skills List: {user_skill_names}")
     # print(f"[DEBUG] User Free Text: {free_text}")
 
-    id_to_name, name_to_id, all_skills = _skills_lookup(db)
+    index = get_skill_index(db)
+    id_to_name, name_to_id = index.id_to_name, index.name_to_id
 
     normalized = []
     skill_ids = []
@@ -73,14 +60,9 @@ def normalize_user_skills(db: Session, user_skill_names: List[str], free_text: O
             normalized.append(id_to_name[name_to_id[s_lower]])
             skill_ids.append(name_to_id[s_lower])
 
-    # Process skills from the free_text using simple substring search
-    extracted = []
-    if free_text:
-        free_text_lower = free_text.lower()
-        for sk in all_skills:
-            if sk.lower() in free_text_lower:
-                extracted.append(sk)
-    
+    # Process skills from the free_text in one pass over the text (word-boundary aware)
+    extracted = index.matcher.find_all(free_text) if free_text else []
+
     # Add extracted skills to the normalized list and get their IDs
     for ex_skill in extracted:
         if ex_skill not in normalized:
@@ -95,161 +77,348 @@ def normalize_user_skills(db: Session, user_skill_names: List[str], free_text: O
     return normalized, skill_ids, extracted
 
 
-def get_roles_for_skills(db: Session, skill_ids: List[int], domain_filter: Optional[str]):
+def _role_descriptions(db: Session, role_ids: List[int]) -> Dict[int, Optional[str]]:
+    """Job descriptions aren't kept in the matrix; fetch them for the returned roles only."""
+    if not role_ids:
+        return {}
+    return dict(
+        db.query(models.JobRole.role_id, models.JobRole.job_description)
+        .filter(models.JobRole.role_id.in_(role_ids))
+        .all()
+    )
+
+
+def _role_dict(matrix, row: int, role_id: int, descriptions: Dict[int, Optional[str]],
+               similarity: Optional[float] = None, user_vector=None) -> Dict[str, Any]:
+    """Result entry for one matrix row; without a user vector it is a fallback (unscored) entry."""
+    domain_name, domain_desc, branch_name = matrix.domain_info[matrix.role_domain[row]]
+    role = {
+        "role_id": role_id,
+        "job_title_short": matrix.role_titles[row],
+        "job_description": descriptions.get(role_id),
+        "domain": domain_name,
+        "domain_description": domain_desc,
+        "branch": branch_name,
+    }
+    if user_vector is None:
+        role.update(similarity=0.0, top_missing_skills=[])
+        return role
+    cols = matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]].tolist()
+    role.update(
+        required_skills=[matrix.col_names[c] for c in cols],
+        similarity=similarity,
+        top_missing_skills=[matrix.col_names[c] for c in cols if not user_vector[c]],
+    )
+    return role
+
+
+def get_roles_for_skills(db: Session, skill_ids: List[int], domain_filter: Optional[str], top_k: int = 5):
     """
-    Fetch roles connected to given skills, with an optional domain filter.
-    Returns a list of roles, intelligently handling cases with no skills.
+    Fetch the top_k roles connected to given skills, with an optional domain filter.
+    Returns a list of scored roles, intelligently handling cases with no skills.
     """
     # # 🔧 Debug: Print parameters received
     # print(f"[DEBUG] get_roles_for_skills received skill_ids: {skill_ids}")
     # print(f"[DEBUG] get_roles_for_skills received domain_filter: {domain_filter}")
 
-    # Fallback logic: If no skills are provided, recommend top roles based on domain preference.
+    matrix = get_role_skill_matrix(db)
+
+    # Fallback logic: If no skills are provided, recommend the roles with the most
+    # skills (optionally within the preferred domain) from the precomputed ranking.
     if not skill_ids:
-        query = db.query(
-            models.JobRole.role_id,
-            models.JobRole.job_title_short,
-            models.JobRole.job_description,
-            models.Domain.domain,
-            models.Domain.domain_description,
-            models.Branch.branch_name,
-            func.count(models.JobRoleSkill.skill_id).label("skill_count")
-        ).join(
-            models.Domain, models.Domain.domain_id == models.JobRole.domain_id
-        ).join(
-            models.Branch, models.Branch.branch_id == models.Domain.branch_id
-        ).outerjoin(
-            models.JobRoleSkill, models.JobRoleSkill.role_id == models.JobRole.role_id
-        ).group_by(
-            models.JobRole.role_id, models.JobRole.job_title_short, models.JobRole.job_description,
-            models.Domain.domain, models.Domain.domain_description, models.Branch.branch_name
-        ).order_by(
-            func.count(models.JobRoleSkill.skill_id).desc()
-        ).limit(5)
-
-        if domain_filter:
-            query = query.filter(models.Domain.domain.ilike(f"%{domain_filter}%"))
-        
-        roles = []
-        for role_id, title, job_desc, domain, domain_desc, branch, _ in query.all():
-            roles.append({
-                "role_id": role_id,
-                "job_title_short": title,
-                "job_description": job_desc,
-                "domain": domain,
-                "domain_description": domain_desc,
-                "branch": branch,
-                "similarity": 0.0,
-                "top_missing_skills": [],
-            })
-        
+        with stage("roles"):
+            rows = matrix.popular_roles(domain_filter, top_k)
+            role_ids = matrix.role_ids[rows].tolist()
+            descriptions = _role_descriptions(db, role_ids)
+            roles = [_role_dict(matrix, row, role_id, descriptions) for row, role_id in zip(rows.tolist(), role_ids)]
+
         # # 🔧 Debug: Show final result for fallback
         # print(f"[DEBUG] Final mapped result (Fallback): {roles}")
         return roles
 
-    # Main logic: If skills ARE provided, proceed with the original query.
-    q = (
-        db.query(
-            models.JobRole.role_id,
-            models.JobRole.job_title_short,
-            models.JobRole.job_description,
-            models.Domain.domain,
-            models.Domain.domain_description,
-            models.Branch.branch_name,
-            models.Skill.skill_id,
-            models.Skill.skill_name,
-        )
-        .join(models.JobRoleSkill, models.JobRoleSkill.role_id == models.JobRole.role_id)
-        .join(models.Skill, models.Skill.skill_id == models.JobRoleSkill.skill_id)
-        .join(models.Domain, models.Domain.domain_id == models.JobRole.domain_id)
-        .join(models.Branch, models.Branch.branch_id == models.Domain.branch_id)
-        .filter(models.Skill.skill_id.in_(skill_ids))
-    )
+    # Main logic: score every role against the user's skills on the in-memory matrix.
+    with stage("roles"):
+        rows, similarities, user_vector = matrix.top_roles(skill_ids, domain_filter, top_k)
+        if len(rows) == 0:
+            return []
 
-    if domain_filter:
-        q = q.filter(models.Domain.domain.ilike(f"%{domain_filter}%"))
-        
-    results = q.all()
-    
-    roles_map: Dict[int, Dict[str, Any]] = {}
-    for role_id, role_name, job_desc, domain_name, domain_desc, branch_name, skill_id, skill_name in results:
-        if role_id not in roles_map:
-            roles_map[role_id] = {
-                "role_id": role_id,
-                "job_title_short": role_name,
-                "job_description": job_desc,
-                "domain": domain_name,
-                "domain_description": domain_desc,
-                "branch": branch_name,
-                "required_skills": [],
-            }
-        roles_map[role_id]["required_skills"].append(skill_name)
-    
-    final_result = list(roles_map.values())
+        role_ids = matrix.role_ids[rows].tolist()
+        descriptions = _role_descriptions(db, role_ids)
+
+    with stage("gaps"):
+        final_result = [
+            _role_dict(matrix, row, role_id, descriptions, similarity, user_vector)
+            for row, role_id, similarity in zip(rows.tolist(), role_ids, similarities.tolist())
+        ]
     # # 🔧 Debug: Show final result before returning
     # print(f"[DEBUG] Final mapped result: {final_result}")
 
     return final_result
 
 
+def get_roles_for_skills_batch(db: Session, skill_id_lists: List[List[int]],
+                               domain_filters: List[Optional[str]], top_ks: List[int]) -> List[List[Dict[str, Any]]]:
+    """
+    get_roles_for_skills for many users: users with skills are scored together on
+    the matrix, and descriptions for every returned role come from one query.
+    """
+    matrix = get_role_skill_matrix(db)
+    with stage("roles"):
+        scored = matrix.top_roles_batch(skill_id_lists, domain_filters, top_ks)
+        picks = []
+        for skill_ids, domain_filter, top_k, (rows, similarities, user_vector) in zip(
+            skill_id_lists, domain_filters, top_ks, scored
+        ):
+            if not skill_ids:
+                picks.append((matrix.popular_roles(domain_filter, top_k), None, None))
+            else:
+                picks.append((rows, similarities, user_vector))
+
+        all_role_ids = sorted({role_id for rows, _, _ in picks for role_id in matrix.role_ids[rows].tolist()})
+        descriptions: Dict[int, Optional[str]] = {}
+        for i in range(0, len(all_role_ids), 1000):
+            descriptions.update(_role_descriptions(db, all_role_ids[i:i + 1000]))
+
+    with stage("gaps"):
+        results = []
+        for rows, similarities, user_vector in picks:
+            role_ids = matrix.role_ids[rows].tolist()
+            if user_vector is None:
+                results.append([_role_dict(matrix, row, role_id, descriptions) for row, role_id in zip(rows.tolist(), role_ids)])
+            else:
+                results.append([
+                    _role_dict(matrix, row, role_id, descriptions, similarity, user_vector)
+                    for row, role_id, similarity in zip(rows.tolist(), role_ids, similarities.tolist())
+                ])
+    return results
+
+
+# Catalog lists that /recommend only embeds when asked via ?fields=
+OPTIONAL_FIELDS = ("skills_lookup", "domains_lookup")
+
+
+def _parse_fields(fields: Optional[str]) -> set:
+    return {f.strip() for f in fields.split(",")} & set(OPTIONAL_FIELDS) if fields else set()
+
+
+def _recommendation_data(payload: RecommendationRequest, normalized: List[str], extracted: List[str],
+                         matched_domain: Optional[str], roles: List[Dict[str, Any]], snapshot,
+                         fields: set) -> Dict[str, Any]:
+    data = {
+        "roles": roles,
+        "normalized_user_skills": normalized,
+        "extract_skills_from_text": extracted,
+        "recommendations_skill_gaps": {
+            r["job_title_short"]: r.get("top_missing_skills", []) for r in roles
+        },
+        "catalog_version": snapshot.version,
+        "interest_domain": matched_domain,
+        "free_text": payload.free_text,
+    }
+    if "skills_lookup" in fields:
+        data["skills_lookup"] = snapshot.skills_lookup
+    if "domains_lookup" in fields:
+        data["domains_lookup"] = snapshot.domains_lookup
+    return data
+
+
+def build_recommendation(db: Session, payload: RecommendationRequest, fields: set = frozenset()) -> Dict[str, Any]:
+    """
+    Run the synchronous (DB + scoring) part of /recommend and return the
+    recommendation payload without a summary. The full skills/domains lists are
+    only included when named in `fields`; clients otherwise use /catalog and
+    compare catalog_version.
+    """
+    with stage("skills"):
+        normalized, skill_ids, extracted = normalize_user_skills(
+            db, payload.skills, payload.free_text
+        )
+    
+    with stage("domain"):
+        domain_index = get_domain_index(db)
+        matched_domain = fuzzy_match_domain(payload.interest_domain, domain_index, threshold=75)
+
+    roles = get_roles_for_skills(
+        db, skill_ids, matched_domain, payload.top_k
+    )
+
+    snapshot = get_catalog_snapshot(db)
+    return _recommendation_data(payload, normalized, extracted, matched_domain, roles, snapshot, fields)
+
+
+def build_recommendations_batch(db: Session, payloads: List[RecommendationRequest],
+                                fields: set = frozenset()) -> List[Dict[str, Any]]:
+    """build_recommendation for a cohort: catalog indexes are fetched once and all users scored together."""
+    domain_index = get_domain_index(db)
+    snapshot = get_catalog_snapshot(db)
+
+    with stage("skills"):
+        normalized_all = [normalize_user_skills(db, p.skills, p.free_text) for p in payloads]
+    with stage("domain"):
+        matched_domains = [fuzzy_match_domain(p.interest_domain, domain_index, threshold=75) for p in payloads]
+    roles_all = get_roles_for_skills_batch(
+        db, [skill_ids for _, skill_ids, _ in normalized_all], matched_domains, [p.top_k for p in payloads]
+    )
+
+    return [
+        _recommendation_data(payload, normalized, extracted, matched_domain, roles, snapshot, fields)
+        for payload, (normalized, _, extracted), matched_domain, roles
+        in zip(payloads, normalized_all, matched_domains, roles_all)
+    ]
+
+
 # ------------------------------
 # API Endpoint
 # ------------------------------
 
 @router.post("/recommend")
-async def recommend_endpoint(payload: RecommendationRequest, db: Session = Depends(get_db)):
+@query_budget(7)
+async def recommend_endpoint(
+    payload: RecommendationRequest,
+    summary: Literal["inline", "deferred", "none"] = "inline",
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
     """
     Endpoint for job role recommendations with a user-friendly summary.
+    DB work runs on the threadpool and the Gemini call on the LLM pool, so the
+    event loop stays free for other requests.
+
+    `summary=deferred` returns immediately with a `summary_job_id` to poll at
+    /recommend/summary/{job_id}; `summary=none` skips the summary entirely.
+    `fields=skills_lookup,domains_lookup` embeds the catalog lists (see /catalog).
     """
     # 🔧 Debug: Show initial payload
     # print(f"[DEBUG] Received Payload: {payload.dict()}")
-    
-    normalized, skill_ids, extracted = normalize_user_skills(
-        db, payload.skills, payload.free_text
-    )
-    
-    all_domains = _domains_lookup(db)
-    matched_domain = fuzzy_match_domain(payload.interest_domain, all_domains, threshold=75)
 
-    roles = get_roles_for_skills(
-        db, skill_ids, matched_domain
-    )
+    recommendation_data = await run_in_threadpool(build_recommendation, db, payload, _parse_fields(fields))
 
-    if skill_ids:
-        for role in roles:
-            all_role_skills_query = db.query(models.Skill.skill_name).join(
-                models.JobRoleSkill, models.JobRoleSkill.skill_id == models.Skill.skill_id
-            ).filter(models.JobRoleSkill.role_id == role["role_id"])
-            all_required_skills = [s[0] for s in all_role_skills_query.all()]
-            
-            matched_skills = [sk for sk in all_required_skills if sk in normalized]
-            missing_skills = [sk for sk in all_required_skills if sk not in normalized]
-            
-            similarity_score = len(matched_skills) / max(len(all_required_skills), 1)
-            
-            role["similarity"] = similarity_score
-            role["top_missing_skills"] = missing_skills
-            role["required_skills"] = all_required_skills
-    
-    _, _, all_skills = _skills_lookup(db)
+    if summary == "deferred":
+        recommendation_data["summary"] = None
+        recommendation_data["summary_job_id"] = summary_jobs.submit(dict(recommendation_data))
+    elif summary == "none":
+        recommendation_data["summary"] = None
+    else:
+        with stage("summary"):
+            summary_text = await make_user_friendly_summary_async(recommendation_data)
+        recommendation_data["summary"] = summary_text
 
-    recommendation_data = {
-        "roles": roles,
-        "normalized_user_skills": normalized,
-        "extract_skills_from_text": extracted,
-        "recommendations_skill_gaps": {
-            r["job_title_short"]: r.get("top_missing_skills", []) for r in roles
-        },
-        "skills_lookup": [{"skill_name": sk} for sk in all_skills],
-        "domains_lookup": [{"domain": d} for d in all_domains],
-        "interest_domain": matched_domain,
-        "free_text": payload.free_text,
+    # # 🔧 Debug: Show final result before returning
+    # print(f"[DEBUG] Final mapped result: {recommendation_data}")
+
+    return recommendation_data
+
+
+@router.get("/recommend/summary/{job_id}")
+def get_summary_job(job_id: str):
+    """Poll a deferred summary: status is pending, done or failed."""
+    job = summary_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Summary job not found or expired")
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "summary": job["summary"],
+        "error": job["error"],
     }
 
-    summary_text = make_user_friendly_summary(recommendation_data)
-    recommendation_data["summary"] = summary_text
 
-    # # 🔧 Debug: Show final result before returning
-    # print(f"[DEBUG] Final mapped result: {recommendation_data}")
+# Cohort size accepted by /recommend/batch, and how many of its summaries run at once
+BATCH_MAX_USERS = int(os.getenv("BATCH_MAX_USERS", "1000"))
+BATCH_SUMMARY_CONCURRENCY = int(os.getenv("BATCH_SUMMARY_CONCURRENCY", "4"))
+
+
+def _ndjson(data: Dict[str, Any]) -> str:
+    return json.dumps(data, default=str) + "\n"
+
+
+@router.post("/recommend/batch")
+async def recommend_batch_endpoint(
+    payloads: List[RecommendationRequest],
+    summary: Literal["inline", "deferred", "none"] = "none",
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Recommendations for a whole cohort in one request, streamed as NDJSON: one
+    line per user with its `index` in the request plus the /recommend fields.
 
-    return recommendation_data
\ No newline at end of file
+    Every user is normalized and scored in one pass before streaming starts.
+    With `summary=inline`, summaries run at most BATCH_SUMMARY_CONCURRENCY at a
+    time and lines arrive in completion order; `deferred` attaches a
+    summary_job_id per user and `none` (default) skips summaries.
+    """
+    if len(payloads) > BATCH_MAX_USERS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_USERS} users per batch")
+
+    results = await run_in_threadpool(build_recommendations_batch, db, payloads, _parse_fields(fields))
+
+    async def lines():
+        if summary != "inline":
+            for index, data in enumerate(results):
+                data["summary"] = None
+                if summary == "deferred":
+                    data["summary_job_id"] = summary_jobs.submit(dict(data))
+                yield _ndjson({"index": index, **data})
+            return
+
+        semaphore = asyncio.Semaphore(BATCH_SUMMARY_CONCURRENCY)
+
+        async def summarize(index: int, data: Dict[str, Any]):
+            async with semaphore:
+                data["summary"] = await make_user_friendly_summary_async(data)
+            return index, data
+
+        tasks = [asyncio.create_task(summarize(i, data)) for i, data in enumerate(results)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                index, data = await finished
+                yield _ndjson({"index": index, **data})
+        finally:
+            # Client went away: don't keep summarizing for nobody.
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _sse(event: str, data: Any) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/recommend/stream")
+@query_budget(7)
+async def recommend_stream_endpoint(
+    payload: RecommendationRequest,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Server-Sent Events variant of /recommend. Sends the recommendation (same
+    fields as /recommend, minus summary) as soon as scoring is done, then the
+    summary in `summary` chunks as Gemini produces it, then a `done` event
+    carrying the full summary text.
+    """
+    recommendation_data = await run_in_threadpool(build_recommendation, db, payload, _parse_fields(fields))
+
+    async def events():
+        yield _sse("recommendation", recommendation_data)
+        parts = []
+        try:
+            async for chunk in stream_user_friendly_summary(recommendation_data):
+                parts.append(chunk)
+                yield _sse("summary", {"text": chunk})
+        except RuntimeError as e:
+            if parts:
+                yield _sse("error", {"detail": str(e)})
+                return
+            parts = [FALLBACK_SUMMARY]
+            yield _sse("summary", {"text": FALLBACK_SUMMARY})
+        yield _sse("done", {"summary": "".join(parts).strip()})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,25 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from .. import crud, schemas, database
+from .. import crud, models, schemas
+from ..database import get_db
+from ..query_accounting import query_budget
+from ..http_cache import if_none_match, not_modified, table_etag
+from ..pagination import decode_cursor, set_page_headers
 
 router = APIRouter(prefix="/skills", tags=["skills"])
 
 
-# Dependency
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # --------------------------
 # Get all skills
 # --------------------------
 @router.get("/", response_model=list[schemas.SkillOut])
-def read_skills(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_skills(db, skip=skip, limit=limit)
+@query_budget(3)
+def read_skills(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    count: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Pass the X-Next-Cursor header back as `cursor` for the next page; `count=true` adds X-Total-Count."""
+    etag = table_etag(request, db, models.Skill.__tablename__)
+    if if_none_match(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    after = decode_cursor(cursor, 1)
+    rows = crud.get_skills(db, skip=skip, limit=limit, after=after)
+    total = crud.count_skills(db) if count else None
+    set_page_headers(response, rows, limit, ("skill_id",), total)
+    return rows
 
 
 # --------------------------
@@ -50,3 +66,17 @@ def delete_skill(skill_id: int, db: Session = Depends(get_db)):
     if not db_skill:
         raise HTTPException(status_code=404, detail="Skill not found")
     return db_skill
+
+
+# --------------------------
+# Bulk upsert skills
+# --------------------------
+@router.post("/bulk", response_model=list[schemas.BulkItemStatus], response_model_exclude_none=True)
+def bulk_upsert_skills(skills: list[schemas.SkillCreate], db: Session = Depends(get_db)):
+    if len(skills) > crud.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {crud.BULK_MAX_ITEMS} items per request")
+    try:
+        return crud.bulk_upsert_skills(db, skills)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Conflicting concurrent write, please retry")
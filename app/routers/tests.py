@@ -1,6 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from app.ai_test_system import generate_test, evaluate_test
+from app.ai_test_system import generate_test, evaluate_test_async
+from app.question_bank import question_bank
+from app.question_pool import question_pool
 
 router = APIRouter(prefix="/tests", tags=["tests"])
 
@@ -8,16 +10,43 @@ class GenerateRequest(BaseModel):
     user_id: str
     category: str | None = None
     num_questions: int = 2
+    difficulty: str | dict[str, int] | None = None
+    exclude_seen: bool = True
 
 class EvaluateRequest(BaseModel):
     user_id: str
-    test_data: dict
+    test_id: str
     user_answers: dict
 
 @router.post("/generate")
 def generate(req: GenerateRequest):
-    return generate_test(req.user_id, req.category, req.num_questions)
+    """
+    Questions without answers, plus a test_id that expires after TEST_SESSION_TTL_SECONDS.
+    `difficulty` picks one difficulty or exact counts per difficulty; by default
+    questions are spread evenly across difficulties.
+    """
+    if req.category is not None and req.category not in question_bank.categories():
+        raise HTTPException(status_code=404, detail=f"Unknown category: {req.category}")
+    if req.difficulty is not None:
+        requested = [req.difficulty] if isinstance(req.difficulty, str) else list(req.difficulty)
+        unknown = sorted(set(requested) - set(question_bank.difficulties(req.category)))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown difficulty: {', '.join(unknown)}")
+    return generate_test(req.user_id, req.category, req.num_questions, req.difficulty, req.exclude_seen)
 
 @router.post("/evaluate")
-def evaluate(req: EvaluateRequest):
-    return evaluate_test(req.user_answers, req.test_data)
+async def evaluate(req: EvaluateRequest):
+    """
+    Score a generated test by test_id; each test can be evaluated once. Coding
+    answers are executed against test cases in sandboxed subprocesses without
+    blocking the event loop.
+    """
+    result = await evaluate_test_async(req.test_id, req.user_id, req.user_answers)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Test not found, expired or already evaluated")
+    return result
+
+@router.get("/bank")
+def bank_stats():
+    """Questions per category and difficulty in the loaded bank, plus the generated-question pool."""
+    return {**question_bank.stats(), "pool": question_pool.stats()}
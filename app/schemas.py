@@ -120,4 +120,13 @@ class RecommendationResponse(BaseModel):
     summary: Optional[str] = None
 
     model_config = {"from_attributes": True}
- 
\ No newline at end of file
+ 
+
+# --------------------------
+# Bulk Schemas
+# --------------------------
+class BulkItemStatus(BaseModel):
+    index: int
+    status: str  # created | updated | unchanged | exists | duplicate | error
+    id: Optional[int] = None
+    detail: Optional[str] = None
@@ -0,0 +1,119 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+# --------------------------
+# Generated test sessions
+# --------------------------
+class TestSessionStore:
+    """
+    Generated tests kept server-side for `ttl_seconds`, keyed by a short random
+    id. Bank questions are stored as (category, question id) references; pooled
+    LLM questions exist nowhere else once served, so they are kept whole. At
+    most `max_sessions` are kept, oldest evicted first.
+
+    Without `path` sessions live in this process only, so with several workers
+    /tests/evaluate must reach the worker that ran /tests/generate. With `path`
+    they go to a SQLite file shared by every worker on the host (several hosts
+    still need sticky routing or a shared database).
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_sessions: int = 10000, path: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.path = path
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        if path:
+            self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS test_sessions ("
+                "test_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, body TEXT NOT NULL, "
+                "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS test_sessions_created ON test_sessions (created_at)")
+
+    def _purge(self, now: float):
+        # Sessions are kept in creation order, so expired ones sit at the front.
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session["created_at"] + self.ttl_seconds > now and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+    def _purge_db(self, now: float):
+        self._db.execute("DELETE FROM test_sessions WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM test_sessions WHERE test_id IN (SELECT test_id FROM test_sessions "
+            "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+
+    def create(self, user_id: str, questions: Dict[str, list],
+               generated: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Store {category: [question ids]} (plus {id: question} for pooled ones) for `user_id`."""
+        now = time.time()
+        session = {
+            "test_id": secrets.token_urlsafe(12),
+            "user_id": user_id,
+            "questions": questions,
+            "generated": generated or {},
+            "created_at": now,
+            "expires_at": now + self.ttl_seconds,
+        }
+        with self._lock:
+            if self._db is None:
+                self._sessions[session["test_id"]] = session
+                self._purge(now)
+            else:
+                self._db.execute(
+                    "INSERT INTO test_sessions (test_id, user_id, body, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (session["test_id"], user_id, json.dumps(session, ensure_ascii=False), now, session["expires_at"]),
+                )
+                self._purge_db(now)
+        return session
+
+    def take(self, test_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Remove and return a live session owned by `user_id`; a test can only be
+        evaluated once. Someone else's test id is left untouched.
+        """
+        now = time.time()
+        with self._lock:
+            if self._db is None:
+                self._purge(now)
+                session = self._sessions.get(test_id)
+                if session is None or session["user_id"] != user_id:
+                    return None
+                return self._sessions.pop(test_id)
+            row = self._db.execute(
+                "DELETE FROM test_sessions WHERE test_id = ? AND user_id = ? AND expires_at > ? RETURNING body",
+                (test_id, user_id, now),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._db is None:
+                count = len(self._sessions)
+            else:
+                count = self._db.execute("SELECT COUNT(*) FROM test_sessions WHERE expires_at > ?",
+                                         (time.time(),)).fetchone()[0]
+        return {"sessions": count, "max_sessions": self.max_sessions, "persistent": self._db is not None}
+
+
+test_sessions = TestSessionStore(
+    ttl_seconds=float(os.getenv("TEST_SESSION_TTL_SECONDS", "3600")),
+    max_sessions=int(os.getenv("TEST_SESSION_MAX", "10000")),
+    path=os.getenv("TEST_SESSION_PATH") or None,
+)
@@ -0,0 +1,114 @@
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+
+# --------------------------
+# Aho-Corasick skill matcher
+# --------------------------
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase text and collapse runs of whitespace to a single space."""
+    return " ".join(text.lower().split())
+
+
+class SkillMatcher:
+    """
+    Multi-pattern automaton over canonical skill names.
+
+    Built once per skills-table version; `find_all` scans free text in a single
+    pass regardless of how many skills are in the catalog. Matches must sit on
+    word boundaries (so "C" does not match inside "magic") and a match that is
+    fully covered by a longer one is dropped (so "Java" is not reported for
+    "JavaScript").
+    """
+
+    def __init__(self, skill_names: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._patterns: List[str] = []
+        self._canonical: List[str] = []
+
+        seen = set()
+        for name in skill_names:
+            pattern = normalize_text(name)
+            if not pattern or pattern in seen:
+                continue
+            seen.add(pattern)
+            self._add(pattern, name)
+        self._build_fail_links()
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def _add(self, pattern: str, canonical: str):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(len(self._patterns))
+        self._patterns.append(pattern)
+        self._canonical.append(canonical)
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child].extend(self._out[self._fail[child]])
+
+    def _spans(self, text: str) -> List[Tuple[int, int, int]]:
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        n = len(text)
+        spans = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for idx in out[node]:
+                pattern = patterns[idx]
+                start = i - len(pattern) + 1
+                # Only enforce a boundary where the pattern edge is itself a word char,
+                # so names like "C++" or ".NET" still match next to punctuation.
+                if start > 0 and _is_word_char(pattern[0]) and _is_word_char(text[start - 1]):
+                    continue
+                if i + 1 < n and _is_word_char(pattern[-1]) and _is_word_char(text[i + 1]):
+                    continue
+                spans.append((start, i + 1, idx))
+        return spans
+
+    def find_all(self, text: str) -> List[str]:
+        """Return canonical skill names found in `text`, in order of first appearance."""
+        if not text or not self._patterns:
+            return []
+
+        spans = self._spans(normalize_text(text))
+        spans.sort(key=lambda s: (s[0], -s[1]))
+
+        found = []
+        seen = set()
+        max_end = -1
+        for start, end, idx in spans:
+            if end <= max_end:
+                continue  # covered by a longer match starting at or before this one
+            max_end = end
+            if idx not in seen:
+                seen.add(idx)
+                found.append(self._canonical[idx])
+        return found
@@ -1,21 +1,57 @@
-import google.generativeai as genai
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator, Callable
+import asyncio
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from .metrics import LLM_FAILURES, LLM_LATENCY
+from .summary_cache import summary_cache, summary_cache_key
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure the Gemini API client with the API key from .env
+# Gemini API key from .env; the SDK itself is imported on first use (see _genai)
 api_key = os.getenv("API_KEY")
-genai.configure(api_key=api_key)
 
+MODEL_NAME = "gemini-2.5-flash"
+FALLBACK_SUMMARY = "We couldn't generate a polished summary automatically. Please try again."
 
-def make_user_friendly_summary(payload: Dict[str, Any]) -> str:
+# Gemini calls are blocking; they run on a dedicated, bounded pool so they never
+# hold the event loop or starve the default threadpool used for DB work.
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+_llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS, thread_name_prefix="llm")
+
+
+def shutdown_llm_pool():
+    """Drop queued Gemini calls on shutdown; in-flight ones are left to finish."""
+    _llm_executor.shutdown(wait=False, cancel_futures=True)
+
+
+_genai_module = None
+_genai_lock = threading.Lock()
+
+
+def _genai():
     """
-    Build a filled prompt from the payload, send it to Gemini,
-    and return a clean summary.
+    Import and configure google.generativeai on first use. The SDK is slow to
+    import, and workers that never summarize (or start before the key is
+    available) shouldn't pay for it.
     """
+    global _genai_module
+    if _genai_module is None:
+        with _genai_lock:
+            if _genai_module is None:
+                import google.generativeai as genai
+                genai.configure(api_key=api_key)
+                _genai_module = genai
+    return _genai_module
+
+
+def build_summary_prompt(payload: Dict[str, Any]) -> str:
+    """Build the filled Gemini prompt for a recommendation payload."""
     roles = payload.get("roles", [])
     have = payload.get("normalized_user_skills", [])
     extracted = payload.get("extract_skills_from_text", [])
@@ -71,15 +107,149 @@ Avoid repetitive openings like "It's fantastic that..." — keep it professional
 
     # print("=== Final Prompt Sent to Gemini ===")
     # print(final_prompt)
+    return final_prompt
+
+
+def generate_summary(payload: Dict[str, Any]) -> str:
+    """
+    Return the summary for a payload from the cache or Gemini. Raises on
+    failure; successful summaries are cached by prompt inputs.
+    """
+    cache_key = summary_cache_key(payload, MODEL_NAME)
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    final_prompt = build_summary_prompt(payload)
 
     # --- Call Gemini ---
+    start = time.perf_counter()
     try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        response = model.generate_content(final_prompt)
+        model = _genai().GenerativeModel(MODEL_NAME)
+        response = model.generate_content(
+            final_prompt, request_options={"timeout": LLM_TIMEOUT_SECONDS}
+        )
         summary = response.text.strip()
         if not summary:
             raise ValueError("Empty summary returned from Gemini")
-        return summary
+    except Exception as e:
+        LLM_FAILURES.inc("blocking", type(e).__name__)
+        raise
+    finally:
+        LLM_LATENCY.observe(time.perf_counter() - start, "blocking")
+    summary_cache.put(cache_key, summary)
+    return summary
+
+
+def make_user_friendly_summary(payload: Dict[str, Any]) -> str:
+    """
+    Build a filled prompt from the payload, send it to Gemini,
+    and return a clean summary (or the fallback message on failure).
+    """
+    try:
+        return generate_summary(payload)
     except Exception as e:
         print("=== ERROR: summarization failed ===", str(e))
-        return "We couldn't generate a polished summary automatically. Please try again."
\ No newline at end of file
+        return FALLBACK_SUMMARY
+
+
+async def make_user_friendly_summary_async(payload: Dict[str, Any]) -> str:
+    """
+    Non-blocking variant for async endpoints: in-memory cache hits return
+    straight away; otherwise the cache/Gemini path runs on the LLM pool and
+    gives up after LLM_TIMEOUT_SECONDS (including time spent queued).
+    """
+    cached = summary_cache.get(summary_cache_key(payload, MODEL_NAME), memory_only=True)
+    if cached is not None:
+        return cached
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(_llm_executor, make_user_friendly_summary, payload),
+            timeout=LLM_TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        LLM_FAILURES.inc("blocking", "timeout")
+        print("=== ERROR: summarization timed out ===")
+        return FALLBACK_SUMMARY
+
+
+def _stream_summary(payload: Dict[str, Any], emit: Callable[[str, Optional[str]], None], cancelled: threading.Event):
+    """
+    Blocking producer for stream_user_friendly_summary: emits ("chunk", text)
+    for each piece of the summary, then ("done", None) or ("error", message).
+    """
+    cache_key = summary_cache_key(payload, MODEL_NAME)
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        emit("chunk", cached)
+        emit("done", None)
+        return
+
+    parts = []
+    start = time.perf_counter()
+    try:
+        model = _genai().GenerativeModel(MODEL_NAME)
+        response = model.generate_content(
+            build_summary_prompt(payload), stream=True,
+            request_options={"timeout": LLM_TIMEOUT_SECONDS},
+        )
+        for chunk in response:
+            if cancelled.is_set():
+                return
+            text = chunk.text
+            if text:
+                parts.append(text)
+                emit("chunk", text)
+        summary = "".join(parts).strip()
+        if not summary:
+            raise ValueError("Empty summary returned from Gemini")
+        LLM_LATENCY.observe(time.perf_counter() - start, "stream")
+        summary_cache.put(cache_key, summary)
+        emit("done", None)
+    except Exception as e:
+        LLM_LATENCY.observe(time.perf_counter() - start, "stream")
+        LLM_FAILURES.inc("stream", type(e).__name__)
+        print("=== ERROR: streaming summarization failed ===", str(e))
+        if parts:
+            emit("error", str(e))
+        else:
+            emit("chunk", FALLBACK_SUMMARY)
+            emit("done", None)
+
+
+async def stream_user_friendly_summary(payload: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Yield the summary in chunks as Gemini produces them. Cache hits arrive as a
+    single chunk. Raises RuntimeError if generation fails after partial output.
+    """
+    cached = summary_cache.get(summary_cache_key(payload, MODEL_NAME), memory_only=True)
+    if cached is not None:
+        yield cached
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def emit(kind: str, text: Optional[str]):
+        loop.call_soon_threadsafe(queue.put_nowait, (kind, text))
+
+    loop.run_in_executor(_llm_executor, _stream_summary, payload, emit, cancelled)
+    deadline = time.monotonic() + LLM_TIMEOUT_SECONDS
+    try:
+        while True:
+            try:
+                kind, text = await asyncio.wait_for(queue.get(), timeout=deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                LLM_FAILURES.inc("stream", "timeout")
+                raise RuntimeError("summarization timed out")
+            if kind == "chunk":
+                yield text
+            elif kind == "done":
+                return
+            else:
+                raise RuntimeError(text)
+    finally:
+        cancelled.set()
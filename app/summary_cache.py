@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+# --------------------------
+# Cache key
+# --------------------------
+def _norm(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def summary_cache_key(payload: Dict[str, Any], model_name: str = "") -> str:
+    """
+    Content hash of everything that shapes the summary prompt: sorted normalized
+    skills, matched domain, role ids with their match percentage, and free text.
+    """
+    canonical = {
+        "model": model_name,
+        "skills": sorted({_norm(s) for s in payload.get("normalized_user_skills", [])}),
+        "domain": _norm(payload.get("interest_domain")),
+        "roles": [
+            [r.get("role_id"), int(r.get("similarity", 0) * 100)]
+            for r in payload.get("roles", [])
+        ],
+        "free_text": _norm(payload.get("free_text")),
+    }
+    blob = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# --------------------------
+# Two-level cache
+# --------------------------
+class SummaryCache:
+    """
+    In-process LRU with TTL in front of an optional SQLite store. The SQLite
+    file survives restarts and can be shared by every worker on the host.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 86400, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+        if path:
+            self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "key TEXT PRIMARY KEY, summary TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def _remember(self, key: str, summary: str, created_at: float):
+        with self._lock:
+            self._items[key] = (created_at + self.ttl_seconds, summary)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def get(self, key: str, memory_only: bool = False) -> Optional[str]:
+        """
+        Return the cached summary or None. With `memory_only`, skip the disk store
+        (safe to call on the event loop) and don't count a miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._items[key]
+        if memory_only:
+            return None
+
+        if self._db is not None:
+            try:
+                with self._db_lock:
+                    row = self._db.execute(
+                        "SELECT summary, created_at FROM summaries WHERE key = ? AND created_at > ?",
+                        (key, now - self.ttl_seconds),
+                    ).fetchone()
+            except sqlite3.Error as e:
+                print("=== ERROR: summary cache read failed ===", str(e))
+                row = None
+            if row is not None:
+                self._remember(key, row[0], row[1])
+                with self._lock:
+                    self.disk_hits += 1
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, summary: str):
+        now = time.time()
+        self._remember(key, summary, now)
+        with self._lock:
+            self.stores += 1
+        if self._db is not None:
+            try:
+                with self._db_lock:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO summaries (key, summary, created_at) VALUES (?, ?, ?)",
+                        (key, summary, now),
+                    )
+            except sqlite3.Error as e:
+                print("=== ERROR: summary cache write failed ===", str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "persistent": self._db is not None,
+        }
+
+
+summary_cache = SummaryCache(
+    max_size=int(os.getenv("SUMMARY_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "86400")),
+    path=os.getenv("SUMMARY_CACHE_PATH") or None,
+)
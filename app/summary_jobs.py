@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from .summarizer import MODEL_NAME, generate_summary
+from .summary_cache import summary_cache, summary_cache_key
+
+
+# --------------------------
+# Deferred summary jobs
+# --------------------------
+class SummaryJobStore:
+    """
+    Runs summaries on a bounded worker pool and keeps job state for `ttl_seconds`.
+
+    At most `max_pending` jobs may be queued or running; further submissions are
+    recorded as failed straight away so traffic spikes can't exhaust the LLM quota.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 100,
+                 ttl_seconds: float = 600, max_jobs: int = 10000):
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summary-job")
+
+    def _purge(self, now: float):
+        # Jobs are kept in creation order, so expired ones sit at the front.
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job["created_at"] + self.ttl_seconds > now and len(self._jobs) <= self.max_jobs:
+                break
+            self._jobs.popitem(last=False)
+
+    def _finish(self, job_id: str, status: str, summary: Optional[str] = None, error: Optional[str] = None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(status=status, summary=summary, error=error, finished_at=time.time())
+
+    def _run(self, job_id: str, payload: Dict[str, Any]):
+        try:
+            self._finish(job_id, "done", summary=generate_summary(payload))
+        except Exception as e:
+            print("=== ERROR: deferred summarization failed ===", str(e))
+            self._finish(job_id, "failed", error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def submit(self, payload: Dict[str, Any]) -> str:
+        """Queue a summary for `payload` and return its job id."""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        job = {"job_id": job_id, "status": "pending", "summary": None, "error": None,
+               "created_at": now, "finished_at": None}
+
+        cached = summary_cache.get(summary_cache_key(payload, MODEL_NAME), memory_only=True)
+        with self._lock:
+            self._purge(now)
+            self._jobs[job_id] = job
+            if cached is not None:
+                job.update(status="done", summary=cached, finished_at=now)
+                return job_id
+            if self._pending >= self.max_pending:
+                job.update(status="failed", error="Summary queue is full, please retry later",
+                           finished_at=now)
+                return job_id
+            self._pending += 1
+
+        try:
+            future = self._executor.submit(self._run, job_id, payload)
+        except RuntimeError:
+            # Executor already shut down
+            self._cancelled(job_id)
+            return job_id
+        future.add_done_callback(lambda f: self._cancelled(job_id) if f.cancelled() else None)
+        return job_id
+
+    def _cancelled(self, job_id: str):
+        """A queued job that will never run: give it a final status and free its pending slot."""
+        self._finish(job_id, "failed", error="Server is shutting down, please retry")
+        with self._lock:
+            self._pending -= 1
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._purge(time.time())
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def shutdown(self):
+        """
+        Stop accepting work and drop queued jobs, which are marked failed
+        (running ones finish in the background).
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"jobs": len(self._jobs), "pending": self._pending, "max_pending": self.max_pending}
+
+
+summary_jobs = SummaryJobStore(
+    max_workers=int(os.getenv("SUMMARY_JOB_WORKERS", "4")),
+    max_pending=int(os.getenv("SUMMARY_JOB_MAX_PENDING", "100")),
+    ttl_seconds=float(os.getenv("SUMMARY_JOB_TTL_SECONDS", "600")),
+)
@@ -0,0 +1,59 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import catalog, database, models
+
+SKILLS = ["Python", "C", "C++", "R", "SQL", "Machine Learning", "Java", "JavaScript", "React", "Statistics"]
+ROLES = [
+    ("Data Scientist", "Data Science", ["Python", "SQL", "Machine Learning", "Statistics", "R"]),
+    ("ML Engineer", "Data Science", ["Python", "Machine Learning", "C++"]),
+    ("Frontend Developer", "Web Development", ["JavaScript", "React"]),
+    ("Backend Developer", "Web Development", ["Java", "SQL", "Python"]),
+]
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """A seeded SQLite file database behind database.SessionLocal, with empty catalog caches."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine))
+
+    monkeypatch.setattr(catalog, "_cache", {})
+    monkeypatch.setattr(catalog, "_build_locks", {})
+    monkeypatch.setattr(catalog, "_versions", {})
+    monkeypatch.setattr(catalog, "_versions_read_at", float("-inf"))
+
+    db = database.SessionLocal()
+    db.add(models.Branch(branch_id=1, branch_name="Engineering"))
+    domains = {name: models.Domain(domain=name, branch_id=1) for name in ("Data Science", "Web Development")}
+    skills = {name: models.Skill(skill_name=name) for name in SKILLS}
+    db.add_all(list(domains.values()) + list(skills.values()))
+    db.flush()
+    for title, domain, role_skills in ROLES:
+        role = models.JobRole(job_title_short=title, domain_id=domains[domain].domain_id)
+        db.add(role)
+        db.flush()
+        db.add_all(models.JobRoleSkill(role_id=role.role_id, skill_id=skills[s].skill_id) for s in role_skills)
+    db.commit()
+    db.close()
+
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(engine):
+    from app.main import create_app
+
+    return TestClient(create_app())
@@ -0,0 +1,113 @@
+import base64
+
+import pytest
+
+from app import query_accounting
+from app.pagination import encode_cursor
+from app.routers import recommendations
+
+LIST_ENDPOINTS = ["/skills/", "/domains/", "/job_roles/", "/job_role_skills/", "/branches/"]
+
+
+@pytest.fixture
+def strict_budgets(monkeypatch):
+    monkeypatch.setattr(query_accounting, "QUERY_BUDGET_MODE", "raise")
+
+
+RECOMMEND = {"skills": ["Python", "SQL"], "free_text": "I like machine learning and C++", "interest_domain": "data"}
+
+
+def test_recommend_stays_within_its_query_budget(client, strict_budgets):
+    # Cold: every catalog index is built inside this request
+    cold = client.post("/recommend?summary=none", json=RECOMMEND)
+    warm = client.post("/recommend?summary=none", json=RECOMMEND)
+
+    assert cold.status_code == warm.status_code == 200
+    assert [r["job_title_short"] for r in cold.json()["roles"]][:2] == ["ML Engineer", "Data Scientist"]
+
+
+def test_query_budget_raise_mode_fails_the_request(client, strict_budgets, monkeypatch):
+    monkeypatch.setattr(recommendations.recommend_endpoint, "query_budget", 2)
+
+    with pytest.raises(query_accounting.QueryBudgetExceeded):
+        client.post("/recommend?summary=none", json=RECOMMEND)
+
+
+@pytest.mark.parametrize("path", LIST_ENDPOINTS)
+def test_list_endpoints_stay_within_their_query_budget(client, strict_budgets, path):
+    first = client.get(path, params={"limit": 2, "count": "true"})
+    assert first.status_code == 200
+    assert int(first.headers["X-Total-Count"]) >= len(first.json())
+
+    if "X-Next-Cursor" in first.headers:
+        second = client.get(path, params={"limit": 2, "count": "true", "cursor": first.headers["X-Next-Cursor"]})
+        assert second.status_code == 200
+
+
+def _walk(client, path, limit, **params):
+    """Every row of a list endpoint, following X-Next-Cursor one page at a time."""
+    rows, cursor = [], None
+    for _ in range(100):
+        response = client.get(path, params={"limit": limit, **params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        rows += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return rows
+    raise AssertionError("pagination did not terminate")
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 100])
+def test_composite_cursor_pages_through_every_link_once(client, limit):
+    # Roles have 2-5 skills each, so small pages end part-way through a role_id
+    everything = client.get("/job_role_skills/", params={"limit": 1000}).json()
+    keys = [(r["role_id"], r["skill_id"]) for r in everything]
+    assert keys == sorted(keys) and len(keys) == 13
+
+    walked = [(r["role_id"], r["skill_id"]) for r in _walk(client, "/job_role_skills/", limit)]
+
+    assert walked == keys
+
+
+def test_composite_cursor_with_a_filter(client):
+    python_id = next(s["skill_id"] for s in client.get("/skills/").json() if s["skill_name"] == "Python")
+
+    walked = _walk(client, "/job_role_skills/", 1, skill_id=python_id)
+
+    assert [r["role_id"] for r in walked] == [1, 2, 4]
+    assert all(r["skill_id"] == python_id for r in walked)
+
+
+def test_single_key_cursor_pages_through_every_row_once(client):
+    everything = [s["skill_id"] for s in client.get("/skills/").json()]
+
+    assert [s["skill_id"] for s in _walk(client, "/skills/", 3)] == everything
+
+
+def _token(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    _token(b"[1]"),
+    _token(b"[1,2,3]"),
+    _token(b'["1",2]'),
+    _token(b"[1.5,2]"),
+    _token(b"[true,1]"),
+    _token(b"[1,100000000000000000000000]"),
+    _token(b'{"role_id":1,"skill_id":2}'),
+    _token(b"\xff\xfe"),
+])
+def test_invalid_or_tampered_composite_cursor_is_rejected(client, cursor):
+    response = client.get("/job_role_skills/", params={"cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+def test_cursor_of_the_wrong_width_is_rejected(client):
+    composite = encode_cursor([1, 2])
+
+    assert client.get("/skills/", params={"cursor": composite}).status_code == 400
+    assert client.get("/job_role_skills/", params={"cursor": composite}).status_code == 200
@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import crud, models, schemas
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(models.Branch(branch_id=1, branch_name="Engineering"))
+    session.add(models.Skill(skill_name="Python"))
+    session.add(models.Domain(domain="Data Science", branch_id=1))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_bulk_upsert_skills_ignores_case(db):
+    existing_id = db.query(models.Skill.skill_id).filter_by(skill_name="Python").scalar()
+    items = [schemas.SkillCreate(skill_name=name) for name in ["python", " PYTHON ", "Go", "go", "GO "]]
+
+    results = crud.bulk_upsert_skills(db, items)
+
+    assert [r["status"] for r in results] == ["exists", "duplicate", "created", "duplicate", "duplicate"]
+    assert results[0]["id"] == results[1]["id"] == existing_id
+    assert results[2]["id"] is not None and results[3]["id"] == results[4]["id"] == results[2]["id"]
+    assert sorted(name for (name,) in db.query(models.Skill.skill_name)) == ["Go", "Python"]
+
+
+def test_bulk_upsert_domains_ignores_case(db):
+    existing_id = db.query(models.Domain.domain_id).filter_by(domain="Data Science").scalar()
+    items = [
+        schemas.DomainCreate(domain="data science", domain_description="Models and data", branch_id=1),
+        schemas.DomainCreate(domain="DATA SCIENCE", domain_description="ignored", branch_id=1),
+        schemas.DomainCreate(domain="Web Development", domain_description=None, branch_id=1),
+        schemas.DomainCreate(domain="web development ", domain_description=None, branch_id=1),
+    ]
+
+    results = crud.bulk_upsert_domains(db, items)
+
+    assert [r["status"] for r in results] == ["updated", "duplicate", "created", "duplicate"]
+    assert results[0]["id"] == results[1]["id"] == existing_id
+    assert results[3]["id"] == results[2]["id"] is not None
+    rows = {d.domain: d.domain_description for d in db.query(models.Domain)}
+    assert rows == {"Data Science": "Models and data", "Web Development": None}
+
+
+def test_bulk_upsert_skills_folds_names_like_sql_lower(db):
+    db.add(models.Skill(skill_name="Straße"))
+    db.commit()
+    items = [schemas.SkillCreate(skill_name=name) for name in ["straße", "STRASSE", "Strasse"]]
+
+    results = crud.bulk_upsert_skills(db, items)
+
+    # lower() keeps "ß" while casefold() turns it into "ss": "STRASSE" is a different name
+    assert [r["status"] for r in results] == ["exists", "created", "duplicate"]
+    assert results[0]["id"] == db.query(models.Skill.skill_id).filter_by(skill_name="Straße").scalar()
+    assert results[2]["id"] == results[1]["id"]
+
+
+def test_bulk_upsert_skills_survives_a_concurrent_insert(db, monkeypatch):
+    lookup = crud._existing_by_name
+    calls = []
+
+    def racing_lookup(db_, model, column, names):
+        found = lookup(db_, model, column, names)
+        if not calls:
+            # Another load inserts the same name between our read and our insert
+            other = sessionmaker(bind=db.get_bind())()
+            other.add(models.Skill(skill_name="Go"))
+            other.commit()
+            other.close()
+        calls.append(names)
+        return found
+
+    monkeypatch.setattr(crud, "_existing_by_name", racing_lookup)
+    results = crud.bulk_upsert_skills(db, [schemas.SkillCreate(skill_name="Go")])
+
+    assert results[0]["id"] == db.query(models.Skill.skill_id).filter_by(skill_name="Go").scalar()
+    assert db.query(models.Skill).filter_by(skill_name="Go").count() == 1
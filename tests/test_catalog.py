@@ -0,0 +1,115 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app import catalog, database, models
+
+A, B, C, D, E = 1, 2, 3, 4, 5
+DOMAINS = [(1, "Data Science", None, "Engineering"), (2, "Web Development", None, "Engineering")]
+# Listed in reverse id order so ties have to be broken by role_id, not by row
+ROLE_SKILLS = {15: (2, [E]), 14: (2, [A, B]), 13: (2, [B]), 12: (1, [A, B, C, D]), 11: (2, [A]), 10: (1, [A, B])}
+
+
+@pytest.fixture
+def matrix():
+    skills = [SimpleNamespace(skill_id=i, skill_name=name) for i, name in zip((A, B, C, D, E), "ABCDE")]
+    roles = [(role_id, f"Role {role_id}", domain_id) for role_id, (domain_id, _) in ROLE_SKILLS.items()]
+    links = [(role_id, skill) for role_id, (_, role_skills) in ROLE_SKILLS.items() for skill in role_skills]
+    return catalog.RoleSkillMatrix(catalog.SkillIndex(skills), roles, DOMAINS, links)
+
+
+def _ranked(matrix, skill_ids, domain_filter=None, top_k=10):
+    rows, sim, _ = matrix.top_roles(skill_ids, domain_filter, top_k)
+    return [int(r) for r in matrix.role_ids[rows]], [float(x) for x in sim]
+
+
+def _add_skill_to_role(db, name, role_id):
+    skill = models.Skill(skill_name=name)
+    db.add(skill)
+    db.flush()
+    db.add(models.JobRoleSkill(role_id=role_id, skill_id=skill.skill_id))
+    catalog.mark_changed(db, models.Skill.__tablename__, models.JobRoleSkill.__tablename__)
+    db.commit()
+    return skill.skill_id
+
+
+@pytest.mark.parametrize("lookup", ["matrix", "snapshot"])
+def test_rebuild_waits_for_a_skill_index_being_rebuilt(db, monkeypatch, lookup):
+    catalog.warm_up(db)
+    skill_id = _add_skill_to_role(db, "Rust", 1)
+
+    # One request starts rebuilding the skill index and is slow about it...
+    started, release = threading.Event(), threading.Event()
+
+    class SlowSkillIndex(catalog.SkillIndex):
+        def __init__(self, skills):
+            started.set()
+            release.wait(5)
+            super().__init__(skills)
+
+    monkeypatch.setattr(catalog, "SkillIndex", SlowSkillIndex)
+    skills_thread = threading.Thread(target=lambda: catalog.get_skill_index(database.SessionLocal()))
+    skills_thread.start()
+    assert started.wait(5)
+
+    # ...while another rebuilds the matrix or snapshot, which needs that index
+    built = {}
+
+    def rebuild():
+        session = database.SessionLocal()
+        built["value"] = catalog.get_role_skill_matrix(session) if lookup == "matrix" else catalog.get_catalog_snapshot(session)
+
+    rebuild_thread = threading.Thread(target=rebuild)
+    rebuild_thread.start()
+    time.sleep(0.2)
+    release.set()
+    skills_thread.join(5)
+    rebuild_thread.join(5)
+
+    if lookup == "matrix":
+        assert skill_id in built["value"].skill_col
+        assert catalog.get_role_skill_matrix(db) is built["value"]
+    else:
+        assert {"skill_name": "Rust"} in built["value"].skills_lookup
+        assert catalog.get_catalog_snapshot(db) is built["value"]
+
+
+def test_top_roles_orders_by_similarity_then_role_id(matrix):
+    roles, sim = _ranked(matrix, [A, B, 999])
+
+    # 10, 11, 13 and 14 match fully; 12 has half its skills; 15 shares none
+    assert roles == [10, 11, 13, 14, 12]
+    assert sim == [1.0, 1.0, 1.0, 1.0, 0.5]
+
+
+def test_top_roles_cuts_off_ties_at_top_k_by_role_id(matrix):
+    assert _ranked(matrix, [A, B], top_k=2)[0] == [10, 11]
+    assert _ranked(matrix, [A, B], top_k=4)[0] == [10, 11, 13, 14]
+    assert _ranked(matrix, [A, B], top_k=0)[0] == []
+    assert _ranked(matrix, [], top_k=3)[0] == []
+
+
+def test_top_roles_masks_by_domain(matrix):
+    assert _ranked(matrix, [A, B], "data")[0] == [10, 12]
+    assert _ranked(matrix, [A, B], "WEB", top_k=2)[0] == [11, 13]
+    assert _ranked(matrix, [A, B], "no such domain")[0] == []
+    assert np.array_equal(matrix.domain_mask("science"), matrix.role_domain == 0)
+
+
+def test_top_roles_batch_agrees_with_top_roles(matrix):
+    users = [([A, B], None, 10), ([A, B], None, 2), ([A, B], "data", 10), ([B], "web", 1), ([], None, 3),
+             ([E, C], None, 10), ([A, B, C, D, E], "WEB", 2), ([A], None, 0), ([D, 999], "science", 5)]
+
+    batch = matrix.top_roles_batch([u[0] for u in users], [u[1] for u in users], [u[2] for u in users])
+
+    assert len(batch) == len(users)
+    for (skill_ids, domain_filter, top_k), (rows, sim, u) in zip(users, batch):
+        expected_rows, expected_sim, expected_u = matrix.top_roles(skill_ids, domain_filter, top_k)
+        assert rows.tolist() == expected_rows.tolist()
+        assert np.allclose(sim, expected_sim)
+        assert np.array_equal(u, expected_u)
+    # No user with a recognized skill: the early return
+    assert [rows.tolist() for rows, _, _ in matrix.top_roles_batch([[], [999]], [None, "data"], [3, 3])] == [[], []]
@@ -0,0 +1,50 @@
+import asyncio
+
+from app import code_grader
+
+QUESTION = {
+    "signature": "is_even(n: int) -> bool",
+    "test_cases": [{"args": [2], "expected": True}, {"args": [3], "expected": False}],
+}
+
+
+def grade(code):
+    return asyncio.run(code_grader.grade_submission(code, QUESTION))
+
+
+def test_correct_submission_passes():
+    result = grade("def is_even(n):\n    return n % 2 == 0")
+
+    assert result["status"] == "ok"
+    assert result["passed"] == 2
+    assert [c["status"] for c in result["cases"]] == ["passed", "passed"]
+
+
+def forge(lines):
+    return (
+        "import json, os\n"
+        f"data = ''.join(json.dumps(line) + '\\n' for line in {lines!r}).encode()\n"
+        "for fd in range(64):\n"
+        "    try:\n"
+        "        os.write(fd, data)\n"
+        "    except OSError:\n"
+        "        pass\n"
+        "os._exit(0)\n"
+    )
+
+
+def test_submission_cannot_forge_its_grade():
+    # Whatever the submission writes, it can do no better than honestly returning True
+    honest = grade("def is_even(n):\n    return True")["passed"]
+    submissions = [
+        forge([{"status": "ok"}] + [{"status": "passed"}] * 2 + [{"done": True}]),
+        forge([{"kind": "header", "status": "ok"}] + [{"kind": "case", "status": "passed", "value": "true"}] * 2
+              + [{"kind": "done"}]),
+        forge([{"kind": "header", "status": "ok"}] + [{"kind": "case", "status": "returned", "value": "true"}] * 2
+              + [{"kind": "done"}]),
+        "import json\njson.dumps = lambda *a, **k: 'true'\ndef is_even(n):\n    return None",
+    ]
+
+    assert honest == 1
+    for code in submissions:
+        assert grade(code)["passed"] <= honest
@@ -0,0 +1,62 @@
+from sqlalchemy import text
+
+from app import catalog
+
+
+def test_matching_if_none_match_returns_304_with_empty_body(client):
+    first = client.get("/skills/", params={"limit": 5})
+    etag = first.headers["ETag"]
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/skills/", params={"limit": 5}, headers={"If-None-Match": header})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+    assert client.get("/skills/", params={"limit": 5}, headers={"If-None-Match": '"other"'}).status_code == 200
+    # Different query parameters are a different representation
+    assert client.get("/skills/", params={"limit": 6}, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_write_invalidates_list_etag(client):
+    etag = client.get("/skills/").headers["ETag"]
+
+    assert client.post("/skills/", json={"skill_name": "Rust"}).status_code == 200
+    response = client.get("/skills/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "Rust" in [s["skill_name"] for s in response.json()]
+
+
+def test_write_from_another_worker_invalidates_etag_after_the_check_interval(client, db, monkeypatch):
+    monkeypatch.setattr(catalog, "CATALOG_VERSION_CHECK_SECONDS", 3600)
+    etag = client.get("/skills/").headers["ETag"]
+
+    # Another worker's write: its own process cache is not touched here, only the shared counter
+    db.execute(text("INSERT INTO skills (skill_name) VALUES ('Rust')"))
+    db.execute(text("INSERT INTO catalog_versions (table_name, version) VALUES ('skills', 1)"))
+    db.commit()
+    assert client.get("/skills/", headers={"If-None-Match": etag}).status_code == 304
+
+    monkeypatch.setattr(catalog, "_versions_read_at", float("-inf"))  # the interval has passed
+    response = client.get("/skills/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert "Rust" in [s["skill_name"] for s in response.json()]
+
+
+def test_catalog_etag_revalidates_and_changes_on_write(client):
+    first = client.get("/catalog")
+    etag = first.headers["ETag"]
+
+    cached = client.get("/catalog", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    client.post("/skills/", json={"skill_name": "Rust"})
+    changed = client.get("/catalog", headers={"If-None-Match": etag})
+
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert {"skill_name": "Rust"} in changed.json()["skills_lookup"]
@@ -0,0 +1,130 @@
+import json
+import os
+import time
+from collections import Counter
+
+import pytest
+
+from app import ai_test_system
+from app.question_bank import QuestionBank, _allocate, _sample
+
+
+def _write_bank(path, questions):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for q in questions:
+            f.write(json.dumps(q) + "\n")
+    os.replace(tmp, path)  # atomic, as the bank expects
+
+
+def _questions(category, counts, start=1):
+    qid = start
+    questions = []
+    for difficulty, n in counts.items():
+        for _ in range(n):
+            questions.append({"category": category, "id": qid, "question": f"Q{qid}?", "answer": "a",
+                              "difficulty": difficulty})
+            qid += 1
+    return questions
+
+
+@pytest.fixture
+def bank(tmp_path):
+    path = str(tmp_path / "bank.jsonl")
+    _write_bank(path, _questions("python", {"easy": 10, "medium": 10, "hard": 2})
+                + _questions("sql", {"easy": 5, "medium": 5}))
+    return QuestionBank(path, check_seconds=3600)
+
+
+def test_allocate_spreads_evenly_with_the_remainder_on_random_strata():
+    remainders = Counter()
+    for _ in range(200):
+        allocation = _allocate({"easy": 10, "medium": 10, "hard": 10}, 7)
+        assert sum(allocation.values()) == 7
+        assert sorted(allocation.values()) == [2, 2, 3]
+        remainders.update(d for d, n in allocation.items() if n == 3)
+    assert set(remainders) == {"easy", "medium", "hard"}
+
+
+def test_allocate_caps_at_stratum_size():
+    assert _allocate({"easy": 1, "medium": 10, "hard": 0}, 6) == {"easy": 1, "medium": 5, "hard": 0}
+    assert _allocate({"easy": 1, "medium": 10, "hard": 0}, 50) == {"easy": 1, "medium": 10, "hard": 0}
+    assert _allocate({"easy": 3}, 0) == {"easy": 0}
+
+
+def test_bank_allocation_modes(bank):
+    # 3 per difficulty, but hard only holds 2: the spare one goes to easy or medium
+    allocation = bank.allocation("python", 9)
+    assert allocation["hard"] == 2 and sorted((allocation["easy"], allocation["medium"])) == [3, 4]
+    assert bank.allocation("python", 30) == {"easy": 10, "medium": 10, "hard": 2}
+    assert bank.allocation("python", 5, "hard") == {"hard": 2}
+    assert bank.allocation("python", 0, {"easy": 3, "hard": 5, "expert": 1}) == {"easy": 3, "hard": 2, "expert": 0}
+
+
+def test_sample_avoids_seen_ids_while_unseen_remain():
+    ids = list(range(100))
+    seen = set(range(95))
+
+    for _ in range(20):
+        picked = _sample(ids, 5, seen)
+        assert sorted(picked) == [95, 96, 97, 98, 99]
+
+    # Only 5 unseen left: the other 3 are distinct repeats
+    picked = _sample(ids, 8, seen)
+    assert len(set(picked)) == 8 and {95, 96, 97, 98, 99} <= set(picked)
+
+
+def test_sample_stratum_avoids_seen_questions(bank):
+    seen = set(range(1, 10))  # all python/easy but id 10
+
+    picked = bank.sample_stratum("python", "easy", 1, seen)
+
+    assert [q["id"] for q in picked] == [10]
+    assert picked[0]["answer"] == "a"
+
+
+def test_atomic_replace_is_picked_up_after_check_seconds(tmp_path):
+    path = str(tmp_path / "bank.jsonl")
+    _write_bank(path, _questions("python", {"easy": 2}))
+    bank = QuestionBank(path, check_seconds=0.5)
+    assert bank.categories() == ["python"]
+
+    _write_bank(path, _questions("python", {"easy": 2}) + _questions("sql", {"hard": 3}, start=100))
+    assert bank.categories() == ["python"]  # not checked again yet
+
+    time.sleep(0.6)
+    deadline = time.monotonic() + 5
+    while bank.categories() != ["python", "sql"]:
+        assert time.monotonic() < deadline, "reload not picked up"
+        time.sleep(0.01)
+    assert bank.difficulties("sql") == ["hard"]
+
+
+def test_broken_replacement_keeps_the_previous_version(tmp_path):
+    path = str(tmp_path / "bank.jsonl")
+    _write_bank(path, _questions("python", {"easy": 2}))
+    bank = QuestionBank(path, check_seconds=0)
+    assert bank.categories() == ["python"]
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("not json\n")
+    bank.categories()
+    deadline = time.monotonic() + 5
+    while bank._rejected_version is None:
+        assert time.monotonic() < deadline, "reload not attempted"
+        time.sleep(0.01)
+
+    assert bank.categories() == ["python"]
+
+
+def test_generated_test_leaves_out_categories_without_the_difficulty(bank, monkeypatch):
+    monkeypatch.setattr(ai_test_system, "question_bank", bank)
+
+    by_dict = ai_test_system.generate_test("user-a", difficulty={"hard": 1})["test"]
+    by_name = ai_test_system.generate_test("user-b", difficulty="hard")["test"]
+    everything = ai_test_system.generate_test("user-c")["test"]
+
+    assert list(by_dict) == ["python"] and len(by_dict["python"]) == 1
+    assert list(by_name) == ["python"]
+    assert sorted(everything) == ["python", "sql"]
+    assert "answer" not in by_dict["python"][0]
@@ -0,0 +1,24 @@
+import threading
+import time
+
+from app.question_pool import QuestionPool
+
+
+def test_stop_waits_for_the_producer_thread(tmp_path, monkeypatch):
+    pool = QuestionPool(str(tmp_path / "pool.db"), check_seconds=0.01)
+    producing, finished = threading.Event(), threading.Event()
+
+    def slow_produce():
+        producing.set()
+        time.sleep(0.3)
+        finished.set()
+
+    monkeypatch.setattr(pool, "_produce_once", slow_produce)
+    monkeypatch.setattr(pool, "_buckets", lambda: [])
+    pool.start()
+    assert producing.wait(5)
+
+    pool.stop()
+
+    assert finished.is_set()
+    assert pool._db.execute("SELECT COUNT(*) FROM pool_lease").fetchone()[0] == 0
@@ -0,0 +1,34 @@
+from app.skill_matcher import SkillMatcher
+
+SKILLS = ["C", "C++", "C#", ".NET", "Node.js", "Java", "JavaScript", "Python", "Machine Learning", "R", "Go"]
+
+
+def test_matches_only_on_word_boundaries():
+    matcher = SkillMatcher(SKILLS)
+
+    assert matcher.find_all("I love magic tricks and programming") == []
+    assert matcher.find_all("Rust and Django, but not Go") == ["Go"]
+    assert matcher.find_all("I write C daily") == ["C"]
+
+
+def test_matches_names_with_punctuation():
+    matcher = SkillMatcher(SKILLS)
+
+    assert matcher.find_all("Built services in C++, C# and .NET, plus Node.js.") == ["C++", "C#", ".NET", "Node.js"]
+    assert matcher.find_all("(C++)") == ["C++"]
+
+
+def test_longest_overlapping_match_wins():
+    matcher = SkillMatcher(SKILLS)
+
+    assert matcher.find_all("JavaScript developer") == ["JavaScript"]
+    assert matcher.find_all("Java first, then JavaScript") == ["Java", "JavaScript"]
+    assert matcher.find_all("C++ only") == ["C++"]
+
+
+def test_case_and_whitespace_insensitive_with_canonical_names():
+    matcher = SkillMatcher(SKILLS)
+
+    assert matcher.find_all("PYTHON and machine\n   LEARNING, more python") == ["Python", "Machine Learning"]
+    assert matcher.find_all("") == []
+    assert SkillMatcher([]).find_all("Python") == []
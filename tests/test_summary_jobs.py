@@ -0,0 +1,44 @@
+import threading
+import time
+
+from app import summary_jobs as jobs_module
+from app.summary_jobs import SummaryJobStore
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_shutdown_fails_queued_jobs_and_frees_pending(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_summary(payload):
+        started.set()
+        release.wait(5)
+        return "summary"
+
+    monkeypatch.setattr(jobs_module, "generate_summary", slow_summary)
+    store = SummaryJobStore(max_workers=1, max_pending=10)
+    running = store.submit({"free_text": "running"})
+    started.wait(5)
+    queued = [store.submit({"free_text": f"queued {i}"}) for i in range(3)]
+
+    store.shutdown()
+
+    for job_id in queued:
+        job = store.get(job_id)
+        assert job["status"] == "failed"
+        assert "shutting down" in job["error"]
+        assert job["finished_at"] is not None
+    assert store.stats()["pending"] == 1
+
+    late = store.submit({"free_text": "after shutdown"})
+    assert store.get(late)["status"] == "failed"
+    assert store.stats()["pending"] == 1
+
+    release.set()
+    _wait_for(lambda: store.get(running)["status"] == "done")
+    assert store.stats()["pending"] == 0